@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the Kerala Floods Blog Generator
+Run: python bench_forest_carbon.py [--size-mb 50] [--images 50] [--jobs 4] [--posts 1000]
+                                   [--mmap-mb 128]
+Suite: python bench_forest_carbon.py --suite [--corpus tiny,small] [--json bench.json]
+                                     [--compare baseline.json] [--threshold 10]
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import blog_templates
+from blog_build import (Post, encode_image_to_data_uri, encode_images, load_posts, render_post,
+                        write_image_data_uri)
+
+
+# Synthetic corpora for --suite: name -> (image count, bytes per image,
+# images per post, --assets mode). A build keeps every inlined data URI
+# (4/3 of the image) in memory, plus the pages being written, so bigger
+# corpora spread their images over more posts and large links them
+# instead. Approximate disk and build peak RSS:
+#   tiny     1 MB disk,    ~25 MB RSS
+#   small   20 MB disk,   ~110 MB RSS
+#   medium 250 MB disk,   ~570 MB RSS
+#   large   10 GB disk,    ~80 MB RSS (images hardlinked into assets/)
+CORPORA = {
+    "tiny": (5, 200 * 1024, 5, "inline"),
+    "small": (20, 1024 * 1024, 10, "inline"),
+    "medium": (50, 5 * 1024 * 1024, 10, "inline"),
+    "large": (500, 20 * 1024 * 1024, 20, "external"),
+}
+
+# Result keys where bigger is better; every other number is a cost
+HIGHER_IS_BETTER = ("mb_s", "posts_s")
+
+
+def make_image(path: Path, size: int) -> Path:
+    """Write a synthetic JPEG-named file of random bytes"""
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining:
+            n = min(remaining, 1 << 20)
+            f.write(os.urandom(n))
+            remaining -= n
+    return path
+
+
+def measure(func, *args):
+    """Run func and return (result, seconds, peak traced bytes)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def bench_encode_memory(size_mb: float) -> None:
+    """Compare peak memory of whole-file vs streaming data URI encoding"""
+    print(f"\n📊 Encode memory: {size_mb:g} MB image")
+    with tempfile.TemporaryDirectory() as tmp:
+        img = make_image(Path(tmp) / "flood-map.jpeg", int(size_mb * 1024 * 1024))
+        out_path = Path(tmp) / "out.html"
+
+        def whole_file():
+            with open(out_path, "w", encoding="ascii") as out:
+                return out.write(encode_image_to_data_uri(img))
+
+        def streaming():
+            with open(out_path, "w", encoding="ascii") as out:
+                return write_image_data_uri(img, out)
+
+        for name, func in (("read_bytes", whole_file), ("streaming", streaming)):
+            chars, elapsed, peak = measure(func)
+            print(f"   {name:<12} peak {peak / 1024 / 1024:8.1f} MB"
+                  f"  ({peak / img.stat().st_size:.2f}x image)"
+                  f"  {elapsed * 1000:8.1f} ms  {chars} chars")
+
+
+# Encodes one image in a fresh interpreter: argv is path, mmap threshold
+ENCODE_CHILD = """
+import sys, time
+from pathlib import Path
+from blog_build import encode_image_to_data_uri
+start = time.perf_counter()
+chars = len(encode_image_to_data_uri(Path(sys.argv[1]), int(sys.argv[2])))
+print(time.perf_counter() - start, chars)
+"""
+
+
+def bench_mmap(size_mb: float) -> None:
+    """Compare peak RSS and time of read_bytes vs mmap data URI encoding
+
+    Each path runs in its own process so peak RSS is its own (wait4).
+    """
+    print(f"\n📊 mmap encode: {size_mb:g} MB image")
+    with tempfile.TemporaryDirectory() as tmp:
+        img = make_image(Path(tmp) / "flood-raster.jpeg", int(size_mb * 1024 * 1024))
+        size = img.stat().st_size
+        for name, threshold in (("read_bytes", size + 1), ("mmap", 1)):
+            proc = subprocess.Popen([sys.executable, "-c", ENCODE_CHILD, str(img), str(threshold)],
+                                    cwd=Path(__file__).resolve().parent, stdout=subprocess.PIPE)
+            out = proc.stdout.read().split()
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            proc.stdout.close()
+            peak = usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+            print(f"   {name:<12} peak RSS {peak / 1024 / 1024:8.1f} MB  ({peak / size:.2f}x image)"
+                  f"  {float(out[0]) * 1000:8.1f} ms  {out[1].decode()} chars")
+
+
+def bench_parallel_encode(count: int, size_mb: float, jobs: int) -> None:
+    """Time serial vs process-pool encoding of a synthetic image set"""
+    print(f"\n📊 Parallel encode: {count} images x {size_mb:g} MB, --jobs {jobs}")
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp)
+        names = [f"figure{i:03d}.jpeg" for i in range(count)]
+        for name in names:
+            make_image(folder / name, int(size_mb * 1024 * 1024))
+
+        timings = {}
+        for n in (1, jobs):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                encode_images(names, folder, jobs=n)
+            timings[n] = time.perf_counter() - start
+            print(f"   jobs={n:<3} {timings[n]:8.2f} s")
+        print(f"   speedup  {timings[1] / timings[jobs]:8.2f}x")
+
+
+def synthetic_posts(count: int) -> list:
+    """Make count posts by cycling the real posts with varied titles and bodies"""
+    sources = load_posts(Path(__file__).resolve().parent / "posts")
+    posts = []
+    for i in range(count):
+        base = sources[i % len(sources)]
+        body = base.body.source + f"\n<!-- synthetic post {i} -->"
+        meta = {**base.meta, "title": f"Synthetic post {i}", "output": f"post-{i:05d}.html"}
+        posts.append(Post(Path(meta["output"]), meta, blog_templates.compile_template(body, meta["output"])))
+    return posts
+
+
+def bench_render(count: int) -> None:
+    """Render synthetic posts with cached vs per-post compiled templates"""
+    print(f"\n📊 Render: {count} synthetic posts")
+    posts = synthetic_posts(count)
+    payload = "data:image/jpeg;base64," + "A" * 4096
+    data_uris = {name: payload for post in posts for name in post.images}
+
+    def render_all(recompile):
+        total = 0
+        for post in posts:
+            if recompile:
+                blog_templates.load_template.cache_clear()
+                post = Post(post.source, post.meta, blog_templates.Template(post.body.source))
+            total += len(render_post(post, data_uris))
+        return total
+
+    for name, recompile in (("recompile", True), ("cached", False)):
+        start = time.perf_counter()
+        total = render_all(recompile)
+        elapsed = time.perf_counter() - start
+        print(f"   {name:<10} {elapsed * 1000:8.1f} ms"
+              f"  {count / elapsed:8.0f} posts/s  {total / 1024 / 1024:.1f} MB rendered")
+
+
+def percentiles(samples: list) -> dict:
+    """Nearest-rank p50/p90/p99 of samples (seconds) in milliseconds"""
+    ordered = sorted(samples)
+    return {f"p{p}_ms": ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)] * 1000
+            for p in (50, 90, 99)}
+
+
+def make_corpus(folder: Path, count: int, size: int, per_post: int) -> list:
+    """Write count synthetic images plus posts that show per_post of them each"""
+    names = [f"figure{i:03d}.jpeg" for i in range(count)]
+    for name in names:
+        make_image(folder / name, size)
+    (folder / "posts").mkdir(exist_ok=True)
+    for start in range(0, count, per_post):
+        chunk = names[start:start + per_post]
+        figures = "\n".join(f"{{{{ figure:{name} | Figure {start + i} }}}}" for i, name in enumerate(chunk))
+        (folder / "posts" / f"bench-{start // per_post:03d}.html").write_text(
+            f"---\ntitle: Benchmark {start // per_post}\nlayout: page.html\nimages: {', '.join(chunk)}\n---\n"
+            f"{figures}\n", encoding="utf-8")
+    return names
+
+
+def suite_encode(folder: Path, names: list) -> dict:
+    """Time each encode_image_to_data_uri call on a corpus"""
+    latencies, peak, total = [], 0, 0
+    for name in names:
+        uri, elapsed, call_peak = measure(encode_image_to_data_uri, folder / name)
+        latencies.append(elapsed)
+        peak = max(peak, call_peak)
+        total += (folder / name).stat().st_size
+        del uri
+    return {"mb_s": total / 2**20 / sum(latencies), **percentiles(latencies), "peak_mb": peak / 2**20}
+
+
+def suite_build(folder: Path, repeat: int, assets: str = "inline") -> dict:
+    """Run the full generator (main()) on a corpus in a fresh process each time
+
+    Peak RSS comes from the build's own --metrics-json report.
+    """
+    script = Path(__file__).resolve().parent / "forest_carbon.py"
+    total = sum(p.stat().st_size for p in folder.glob("*.jpeg"))
+    latencies, peak = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, str(script), "--force", "--no-cache", "--assets", assets,
+                        "--metrics-json", "metrics.json"], cwd=folder, check=True, stdout=subprocess.DEVNULL)
+        latencies.append(time.perf_counter() - start)
+        metrics = json.loads((folder / "metrics.json").read_text(encoding="utf-8"))
+        peak = max(peak, metrics["total"]["peak_rss"])
+    return {"mb_s": total * repeat / 2**20 / sum(latencies), **percentiles(latencies), "peak_mb": peak / 2**20}
+
+
+def suite_noop(folder: Path, repeat: int, assets: str = "inline") -> dict:
+    """Time a rebuild with nothing to do, as an editor hook or watch loop runs it
+
+    Run after suite_build, so every page is up to date. import_ms is the
+    generator's own import time, from one run under -X importtime.
+    """
+    script = Path(__file__).resolve().parent / "forest_carbon.py"
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, str(script), "--assets", assets], cwd=folder, check=True,
+                       stdout=subprocess.DEVNULL)
+        latencies.append(time.perf_counter() - start)
+    report = subprocess.run([sys.executable, "-X", "importtime", str(script), "--assets", assets], cwd=folder,
+                            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True).stderr
+    imported = [line.split("|") for line in report.splitlines() if line.rstrip().endswith("| blog_build")]
+    return {**percentiles(latencies), "import_ms": int(imported[-1][1]) / 1000 if imported else 0.0}
+
+
+def suite_render(count: int) -> dict:
+    """Render count synthetic posts, timing each"""
+    posts = synthetic_posts(count)
+    payload = "data:image/jpeg;base64," + "A" * 4096
+    data_uris = {name: payload for post in posts for name in post.images}
+    latencies, total = [], 0
+    tracemalloc.start()
+    try:
+        for post in posts:
+            start = time.perf_counter()
+            total += len(render_post(post, data_uris))
+            latencies.append(time.perf_counter() - start)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"posts_s": count / sum(latencies), "mb_s": total / 2**20 / sum(latencies),
+            **percentiles(latencies), "peak_mb": peak / 2**20}
+
+
+def run_suite(corpora: list, repeat: int, posts: int) -> dict:
+    """Run every suite benchmark and return {"meta": ..., "results": {name: numbers}}"""
+    results = {}
+    for corpus in corpora:
+        count, size, per_post, assets = CORPORA[corpus]
+        print(f"\n📊 Corpus {corpus}: {count} images x {size / 1024:g} KB, {per_post} per post, --assets {assets}")
+        with tempfile.TemporaryDirectory() as tmp:
+            folder = Path(tmp)
+            names = make_corpus(folder, count, size, per_post)
+            for kind, bench in (("encode", lambda: suite_encode(folder, names)),
+                                ("build", lambda: suite_build(folder, repeat, assets)),
+                                ("noop", lambda: suite_noop(folder, repeat, assets))):
+                results[f"{corpus}/{kind}"] = bench()
+                print_result(f"{corpus}/{kind}", results[f"{corpus}/{kind}"])
+    print(f"\n📊 Render: {posts} synthetic posts")
+    results["render"] = suite_render(posts)
+    print_result("render", results["render"])
+    meta = {"python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "repeat": repeat}
+    return {"meta": meta, "results": results}
+
+
+def print_result(name: str, numbers: dict) -> None:
+    print(f"   {name:<16} " + "  ".join(f"{key} {value:,.1f}" for key, value in numbers.items()))
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Regressions worse than threshold percent, as printable lines"""
+    regressions = []
+    for name, numbers in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        for key, value in numbers.items():
+            old = before.get(key)
+            if not old:
+                continue
+            change = (value - old) / old * 100
+            worse = -change if key in HIGHER_IS_BETTER else change
+            if worse > threshold:
+                regressions.append(f"{name} {key}: {old:,.1f} → {value:,.1f} ({change:+.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=float, default=50,
+                        help="synthetic image size for the memory benchmark")
+    parser.add_argument("--mmap-mb", type=float, default=128,
+                        help="synthetic image size for the read_bytes vs mmap benchmark")
+    parser.add_argument("--images", type=int, default=50,
+                        help="number of synthetic images for the parallel benchmark")
+    parser.add_argument("--image-mb", type=float, default=2,
+                        help="size of each image for the parallel benchmark")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="worker processes for the parallel benchmark")
+    parser.add_argument("--posts", type=int, default=1000,
+                        help="number of synthetic posts for the render benchmark")
+    parser.add_argument("--suite", action="store_true",
+                        help="run the corpus suite (encode, full build, render) instead")
+    parser.add_argument("--corpus", default="tiny,small",
+                        help=f"comma-separated suite corpora from {', '.join(CORPORA)}, or all "
+                             "(default: %(default)s; medium needs ~250 MB of disk, large ~10 GB; "
+                             "see CORPORA for memory)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="full builds per corpus in the suite (default: %(default)s)")
+    parser.add_argument("--json", metavar="FILE",
+                        help="write suite results to FILE, e.g. to keep as a baseline")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="compare suite results with a --json file and exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=10,
+                        help="percent change that counts as a regression (default: %(default)s)")
+    args = parser.parse_args()
+    if args.suite:
+        corpora = list(CORPORA) if args.corpus == "all" else args.corpus.split(",")
+        unknown = [c for c in corpora if c not in CORPORA]
+        if unknown:
+            parser.error(f"unknown corpus: {', '.join(unknown)}")
+        current = run_suite(corpora, args.repeat, args.posts)
+        if args.json:
+            Path(args.json).write_text(json.dumps(current, indent=2), encoding="utf-8")
+            print(f"\n💾 Results written to {args.json}")
+        if args.compare:
+            baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+            regressions = compare(current, baseline, args.threshold)
+            if regressions:
+                print(f"\n⚠️  {len(regressions)} regressions over {args.threshold:g}% vs {args.compare}:")
+                for line in regressions:
+                    print(f"   {line}")
+                sys.exit(1)
+            print(f"\n✅ No regressions over {args.threshold:g}% vs {args.compare}")
+        return
+    bench_encode_memory(args.size_mb)
+    bench_mmap(args.mmap_mb)
+    bench_parallel_encode(args.images, args.image_mb, args.jobs)
+    bench_render(args.posts)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Page-weight budgets and lint checks for the blog generator's --budget mode
+Measures each built page (HTML, inline images, CSS, linked assets, DOM
+size) against per-page and per-image limits, flags common HTML problems,
+and writes a machine-readable report, so content regressions are caught
+before deploy.
+"""
+import json
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+# Default limits; bytes are as served, before gzip/brotli
+LIMITS = {
+    "total_kb": 1024,          # HTML plus linked local images and stylesheets
+    "inline_images_kb": 512,   # data URIs in the HTML
+    "css_kb": 100,             # inline <style> plus linked stylesheets
+    "dom_nodes": 1500,         # elements in the page
+    "image_kb": 250,           # any single image, inlined or linked
+}
+
+# Offenders listed per page over budget
+TOP_OFFENDERS = 5
+
+
+class BudgetError(Exception):
+    """Raised for a page over budget in strict mode; carries its check result"""
+
+    def __init__(self, result: dict):
+        self.result = result
+        super().__init__("over budget: " + "; ".join(describe(v) for v in result["violations"]))
+
+
+def _kb(n: int) -> str:
+    return f"{n / 1024 / 1024:.1f} MB" if n >= 1024 * 1024 else f"{n / 1024:.1f} KB"
+
+
+def describe(violation: dict) -> str:
+    """One line for a violation, e.g. "total 1.9 MB > 1.0 MB" """
+    value, limit = violation["value"], violation["limit"]
+    if violation["metric"] == "dom_nodes":
+        return f"{violation['metric']} {value} > {limit}"
+    name = violation.get("image") or violation["metric"].removesuffix("_kb")
+    return f"{name} {_kb(value)} > {_kb(limit)}"
+
+
+class PageScan(HTMLParser):
+    """Sizes, local asset references and lint findings of one page"""
+
+    def __init__(self, page: str):
+        super().__init__(convert_charrefs=True)
+        self.nodes = 0
+        self.inline_images = 0
+        self.inline_css = 0
+        self.assets = []
+        self.lint = []
+        self.ids = set()
+        self.title = False
+        self.description = False
+        self._style = False
+        self.feed(page)
+        self.close()
+
+    def handle_starttag(self, tag, attrs):
+        self.nodes += 1
+        attrs = dict(attrs)
+        if attrs.get("id"):
+            if attrs["id"] in self.ids:
+                self.lint.append(f"duplicate id {attrs['id']!r}")
+            self.ids.add(attrs["id"])
+        for name in ("src", "data-src"):
+            value = attrs.get(name) or ""
+            if value.startswith("data:image/") and not value.startswith("data:image/svg+xml,"):
+                self.inline_images += len(value)
+        style = attrs.get("style") or ""
+        if "url(" in style and "data:image/" in style:
+            self.inline_images += len(style)
+        if tag == "img":
+            src = attrs.get("data-src") or attrs.get("src") or ""
+            if "alt" not in attrs:
+                self.lint.append(f"<img> without alt: {src[:60]}")
+            if not ("width" in attrs and "height" in attrs):
+                self.lint.append(f"<img> without width/height (layout shift): {src[:60]}")
+            if src and not src.startswith("data:"):
+                self.assets.append(("image", src))
+        elif tag == "link" and attrs.get("href") and ("stylesheet" in (attrs.get("rel") or "")
+                                                     or attrs.get("as") == "style"):
+            self.assets.append(("css", attrs["href"]))
+        elif tag == "html" and not attrs.get("lang"):
+            self.lint.append("<html> without lang")
+        elif tag == "title":
+            self.title = True
+        elif tag == "meta" and (attrs.get("name") or "").lower() == "description" and attrs.get("content"):
+            self.description = True
+        elif tag == "style":
+            self._style = True
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag == "style":
+            self._style = False
+
+    def handle_data(self, data):
+        if self._style:
+            self.inline_css += len(data.encode("utf-8"))
+
+
+class Budget:
+    """Checks pages against limits and collects the results for the report
+
+    check() is safe to call from the build threads; record() and the
+    reporting run in the main thread.
+    """
+
+    def __init__(self, limits: dict = None, strict: bool = False):
+        self.limits = dict(LIMITS, **(limits or {}))
+        self.strict = strict
+        self.results = []
+
+    def check(self, url: str, page: str, images: dict, out_dir: Path) -> dict:
+        """Measure a final page; images maps each image it uses to its bytes as served"""
+        scan = PageScan(page)
+        html_bytes = len(page.encode("utf-8"))
+        linked = {}
+        for kind, href in scan.assets:
+            parts = urlsplit(href)
+            if parts.scheme or parts.netloc:
+                continue
+            path = out_dir / unquote(parts.path)
+            if path.is_file():
+                linked[href] = (kind, path.stat().st_size)
+        css = scan.inline_css + sum(size for kind, size in linked.values() if kind == "css")
+        measured = {
+            "total_kb": html_bytes + sum(size for _, size in linked.values()),
+            "inline_images_kb": scan.inline_images,
+            "css_kb": css,
+            "dom_nodes": scan.nodes,
+        }
+        violations = []
+        for metric, value in measured.items():
+            limit = self.limits[metric] * (1 if metric == "dom_nodes" else 1024)
+            if value > limit:
+                violations.append({"metric": metric, "value": value, "limit": limit})
+        image_limit = self.limits["image_kb"] * 1024
+        for name, size in sorted(images.items(), key=lambda item: -item[1]):
+            if size > image_limit:
+                violations.append({"metric": "image_kb", "image": name, "value": size, "limit": image_limit})
+
+        lint = list(scan.lint)
+        if not scan.title:
+            lint.append("no <title>")
+        if not scan.description:
+            lint.append("no meta description")
+        offenders = [{"item": f"image {name}", "bytes": size} for name, size in images.items()]
+        offenders += [{"item": f"stylesheet {href}", "bytes": size} for href, (kind, size) in linked.items()
+                      if kind == "css"]
+        offenders.append({"item": "inline CSS", "bytes": scan.inline_css})
+        offenders.append({"item": "HTML without inline images and CSS",
+                          "bytes": max(0, html_bytes - scan.inline_images - scan.inline_css)})
+        offenders.sort(key=lambda o: -o["bytes"])
+        return {
+            "url": url,
+            "html_bytes": html_bytes,
+            "total_bytes": measured["total_kb"],
+            "inline_image_bytes": measured["inline_images_kb"],
+            "css_bytes": css,
+            "dom_nodes": scan.nodes,
+            "images": images,
+            "violations": violations,
+            "offenders": offenders[:TOP_OFFENDERS],
+            "lint": lint,
+        }
+
+    def record(self, result: dict, cached: bool = False) -> None:
+        """Keep a page's result and print its violations and lint findings
+
+        cached marks the result of an up-to-date page, checked when it was
+        last built.
+        """
+        self.results.append(result)
+        if result["violations"]:
+            icon = "❌" if self.strict else "⚠️ "
+            print(f"{icon} Budget: {result['url']}{' (unchanged)' if cached else ''} over: "
+                  + "; ".join(describe(v) for v in result["violations"]))
+            for offender in result["offenders"]:
+                print(f"     {_kb(offender['bytes']):>10}  {offender['item']}")
+        for finding in result["lint"]:
+            print(f"🧹 Lint: {result['url']}: {finding}")
+
+    @property
+    def failed(self) -> bool:
+        return self.strict and any(result["violations"] for result in self.results)
+
+    def print_summary(self) -> None:
+        over = [result["url"] for result in self.results if result["violations"]]
+        findings = sum(len(result["lint"]) for result in self.results)
+        if over:
+            print(f"\n💸 Budget: {len(over)} of {len(self.results)} pages over budget"
+                  + (" (strict: build fails)" if self.strict else "") + f", {findings} lint findings")
+        else:
+            print(f"\n💸 Budget: {len(self.results)} pages within budget, {findings} lint findings")
+
+    def write_report(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        report = {"limits": self.limits, "strict": self.strict, "failed": self.failed, "pages": self.results}
+        path.write_text(json.dumps(report, indent=2), encoding="utf-8")
@@ -0,0 +1,1536 @@
+"""
+Kerala Floods 2018 Blog Generator
+Renders every post in posts/ to HTML, embedding images as base64 data URIs.
+Run it with forest_carbon.py; the code lives here so Python loads it from
+cached bytecode. Modules only some modes need (asyncio, the watcher and
+server, process pools, Pillow, and the CSS, search, sitemap, budget and
+output stages) are imported when that mode or stage runs, so a build
+with nothing to do loads little more than this file.
+"""
+import argparse
+import base64
+import hashlib
+import html
+import itertools
+import json
+import mmap
+import os
+import re
+import threading
+import time
+import urllib.parse
+from collections import namedtuple
+from contextlib import nullcontext
+from pathlib import Path
+
+import blog_images
+import blog_templates
+from blog_images import MIME_TYPES, best_variant, bytes_saved, inline_variant, make_placeholders, optimize_images
+from blog_metrics import Metrics, profiled, timed
+from blog_templates import Template, compile_template, render
+
+# --- EDIT: Add your posts here (front-matter + body, see posts/*.html) ---
+# Each post lists its images in front-matter; they must be in the folder
+# the generator is run from
+posts_dir = "posts"
+
+# Layout used by posts that don't name one in front-matter
+default_layout = "page.html"
+
+# Encoded images are cached here between runs (delete the folder to reset)
+cache_dir = ".blogcache"
+cache_max_mb = 512
+
+# What each generated page was built from, for incremental rebuilds
+manifest_file = "manifest.json"
+
+# With --assets external/hybrid, images are copied here (next to the pages)
+assets_dir = "assets"
+inline_max_kb = 8
+
+# With --search, the sharded index and its search.js loader go here;
+# shards past search_shard_kb are split, pages keep their heaviest terms
+search_dir = "search"
+search_shard_kb = 32
+search_max_terms = 500
+
+# With --site-url, names the feeds and the index pages
+site_title = "Encode Nature Blog"
+index_per_page = 20
+
+# Default --budget limits; bytes are as served, before gzip/brotli
+budget_limits = {"total_kb": 1024, "inline_images_kb": 512, "css_kb": 100, "dom_nodes": 1500, "image_kb": 250}
+
+# sizes attribute for --optimize srcsets: full width up to the 1200px container
+picture_sizes = "(max-width: 1200px) 100vw, 1200px"
+
+# --lazy-images placeholder fill when Pillow cannot compute an image's colour
+placeholder_color = "#e2e8f0"
+
+# Read size for the streaming encoder; a multiple of 3 so every chunk
+# base64-encodes without padding and chunks can be concatenated. It is
+# also a whole number of pages, so encoded chunks of a mapping can be
+# released with madvise
+CHUNK_SIZE = 3 * 256 * 1024
+
+# Images at least this big are memory-mapped instead of read onto the heap,
+# and streamed from disk into pages that are written as rendered
+MMAP_THRESHOLD = 8 * 1024 * 1024
+
+# Stands in a rendered page for a streamed image: "data:\0<index>:<length>\0"
+STREAM_MARK = re.compile("data:\0([0-9]+):([0-9]+)\0")
+
+
+def image_mime_type(path: Path, head: bytes = None) -> str:
+    """MIME type of an image from its first bytes if given, else its suffix"""
+    from blog_sniff import SUFFIX_TYPES, sniff
+
+    mime = sniff(head)[0] if head else None
+    return mime or SUFFIX_TYPES.get(path.suffix.lower().lstrip('.'), 'application/octet-stream')
+
+def encode_image_to_data_uri(path: Path, mmap_threshold: int = MMAP_THRESHOLD) -> str:
+    """Convert image file to base64 data URI
+
+    Files of mmap_threshold bytes or more are memory-mapped and encoded
+    in CHUNK_SIZE memoryview slices, so the image itself is never copied
+    onto the heap.
+    """
+    try:
+        size = path.stat().st_size
+        if size and size >= mmap_threshold:
+            return _encode_mapped(path, size)
+        return data_uri_from_bytes(path, path.read_bytes())
+    except Exception as e:
+        print(f"Error encoding {path}: {e}")
+        return ""
+
+def data_uri_from_bytes(path: Path, data: bytes) -> str:
+    """Base64 data URI of an image already read from path"""
+    mime = image_mime_type(path, data)
+    b64 = base64.b64encode(data).decode('ascii')
+    return f"data:{mime};base64,{b64}"
+
+def _encode_mapped(path: Path, size: int) -> str:
+    from blog_sniff import HEADER_BYTES
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        try:
+            prefix = f"data:{image_mime_type(path, view[:HEADER_BYTES])};base64,".encode("ascii")
+            out = bytearray(len(prefix) + (size + 2) // 3 * 4)
+            out[:len(prefix)] = prefix
+            pos = len(prefix)
+            if hasattr(mapped, "madvise"):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            for start in range(0, size, CHUNK_SIZE):
+                encoded = base64.b64encode(view[start:start + CHUNK_SIZE])
+                out[pos:pos + len(encoded)] = encoded
+                pos += len(encoded)
+                # Encoded pages leave our RSS; they stay in the page cache
+                if hasattr(mmap, "MADV_DONTNEED"):
+                    mapped.madvise(mmap.MADV_DONTNEED, start, min(CHUNK_SIZE, size - start))
+        finally:
+            view.release()
+    return out.decode("ascii")
+
+def _timed_encode(path: Path, data: bytes = None):
+    if data is None:
+        return timed(encode_image_to_data_uri, path)
+    return timed(data_uri_from_bytes, path, data)
+
+def write_image_data_uri(path: Path, out, chunk_size: int = CHUNK_SIZE) -> int:
+    """Stream an image as a base64 data URI into a text file handle
+
+    Only one chunk of the image is held in memory at a time, so peak usage
+    stays around 2.3x ``chunk_size`` however large the image is. Returns the
+    number of characters written. build_site uses it (see write_streamed)
+    for big images in pages that are written as rendered; it is measured
+    by bench_forest_carbon.py.
+    """
+    if chunk_size <= 0 or chunk_size % 3:
+        raise ValueError(f"chunk_size must be a positive multiple of 3, got {chunk_size}")
+    buf = bytearray(chunk_size)
+    view = memoryview(buf)
+    written = 0
+    with open(path, "rb") as f:
+        while True:
+            # Fill the whole buffer so only the final chunk can carry padding
+            n = f.readinto(buf)
+            while 0 < n < chunk_size:
+                more = f.readinto(view[n:])
+                if not more:
+                    break
+                n += more
+            if not written:
+                # The type is sniffed from the first chunk, which is read anyway
+                written = out.write(f"data:{image_mime_type(path, view[:n])};base64,")
+            if not n:
+                break
+            written += out.write(base64.b64encode(view[:n]).decode('ascii'))
+            if n < chunk_size:
+                break
+    return written
+
+def stream_mark(index: int, path: Path) -> str:
+    """The src a page holds for the index-th streamed image, path (see STREAM_MARK)
+
+    The mark records the length of the data URI it stands for, so the
+    page's repeat statistics stay right.
+    """
+    from blog_sniff import HEADER_BYTES
+
+    with open(path, "rb") as f:
+        prefix = f"data:{image_mime_type(path, f.read(HEADER_BYTES))};base64,"
+    return f"data:\0{index}:{len(prefix) + (path.stat().st_size + 2) // 3 * 4}\0"
+
+def data_uri_length(src: str) -> int:
+    """Length of a data URI, or of the one a stream mark stands for"""
+    mark = STREAM_MARK.fullmatch(src)
+    return int(mark[2]) if mark else len(src)
+
+def write_streamed(path: Path, page: str, streamed: list) -> int:
+    """Atomically write page to path, streaming in the images its marks stand for
+
+    streamed lists the image paths by mark index. Each image is encoded
+    chunk by chunk into the file (see write_image_data_uri), so it is
+    never held in memory whole. Returns the bytes written.
+    """
+    import io
+
+    from blog_output import atomic_open
+
+    parts = STREAM_MARK.split(page)
+    with atomic_open(path) as f:
+        out = io.TextIOWrapper(f, encoding="utf-8", newline="")
+        out.write(parts[0])
+        for index, _, text in zip(parts[1::3], parts[2::3], parts[3::3]):
+            write_image_data_uri(streamed[int(index)], out)
+            out.write(text)
+        out.flush()
+        out.detach()
+        return f.tell()
+
+class DataURICache:
+    """On-disk cache of encoded images, content-addressed by sha256
+
+    ``index.json`` remembers the (size, mtime, sha256) each image path had
+    when it was last encoded, so an unchanged file is a hit without being
+    read at all. Payloads are stored once per content hash as
+    ``<sha256>.b64`` and evicted least-recently-used past ``max_bytes``.
+    """
+
+    def __init__(self, folder: Path, max_bytes: int = cache_max_mb * 1024 * 1024):
+        self.folder = Path(folder)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._pending = {}
+        try:
+            index = json.loads((self.folder / "index.json").read_text(encoding="utf-8"))
+            self.files = index["files"]
+            self.entries = index["entries"]
+        except (OSError, ValueError, KeyError):
+            self.files = {}
+            self.entries = {}
+
+    def _payload_path(self, sha: str) -> Path:
+        return self.folder / f"{sha}.b64"
+
+    def get(self, path: Path):
+        """Return the cached data URI for path, or None on a miss"""
+        key = str(path.resolve())
+        st = path.stat()
+        record = self.files.get(key)
+        if record and record[:2] == [st.st_size, st.st_mtime_ns]:
+            sha = record[2]
+        else:
+            with open(path, "rb") as f:
+                sha = hashlib.file_digest(f, "sha256").hexdigest()
+            self._pending[key] = [st.st_size, st.st_mtime_ns, sha]
+
+        if sha in self.entries:
+            try:
+                payload = self._payload_path(sha).read_text(encoding="ascii")
+            except OSError:
+                del self.entries[sha]
+            else:
+                self.files[key] = self._pending.pop(key, record)
+                self.entries[sha]["used"] = time.time()
+                self.hits += 1
+                mime = self.entries[sha].get("mime") or image_mime_type(path)
+                return f"data:{mime};base64,{payload}"
+        self.misses += 1
+        return None
+
+    def put(self, path: Path, data_uri: str) -> None:
+        """Store a freshly encoded data URI for path"""
+        key = str(path.resolve())
+        record = self._pending.pop(key, None)
+        if record is None:
+            st = path.stat()
+            with open(path, "rb") as f:
+                sha = hashlib.file_digest(f, "sha256").hexdigest()
+            record = [st.st_size, st.st_mtime_ns, sha]
+        sha = record[2]
+        payload = data_uri.partition(",")[2]
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self._payload_path(sha).write_text(payload, encoding="ascii")
+        self.files[key] = record
+        mime = data_uri[len("data:"):data_uri.index(";")]
+        self.entries[sha] = {"bytes": len(payload), "used": time.time(), "mime": mime}
+
+    def save(self) -> None:
+        """Evict least-recently-used payloads over the size cap and write the index"""
+        total = sum(entry["bytes"] for entry in self.entries.values())
+        for sha in sorted(self.entries, key=lambda sha: self.entries[sha]["used"]):
+            if total <= self.max_bytes:
+                break
+            total -= self.entries.pop(sha)["bytes"]
+            self._payload_path(sha).unlink(missing_ok=True)
+        self.files = {key: record for key, record in self.files.items() if record[2] in self.entries}
+
+        self.folder.mkdir(parents=True, exist_ok=True)
+        tmp = self.folder / "index.json.tmp"
+        tmp.write_text(json.dumps({"files": self.files, "entries": self.entries}), encoding="utf-8")
+        os.replace(tmp, self.folder / "index.json")
+
+def image_aliases(paths: dict) -> dict:
+    """Map each image (name -> Path) to the first one with identical bytes
+
+    Only files whose size matches another's are hashed, since a unique
+    size means unique content. Unique images map to themselves.
+    """
+    by_size = {}
+    for name, path in paths.items():
+        by_size.setdefault(path.stat().st_size, []).append(name)
+    keys = {}
+    for names in by_size.values():
+        for name in names:
+            if len(names) == 1:
+                keys[name] = name
+                continue
+            with open(paths[name], "rb") as f:
+                keys[name] = hashlib.file_digest(f, "sha256").hexdigest()
+    first = {}
+    return {name: first.setdefault(keys[name], name) for name in paths}
+
+def encode_images(filenames, folder: Path, jobs: int = 1, cache: DataURICache = None,
+                  paths: dict = None, metrics: Metrics = None, aliases: dict = None) -> dict:
+    """Encode images found in folder to data URIs, keyed by filename
+
+    With jobs > 1 the encoding is spread over a process pool; the result
+    order and the printed progress/warnings match the serial run. Images
+    already in cache are not encoded again. paths can name a different
+    file to encode for some filenames, such as an optimized variant.
+    Each encode call is timed into metrics, even inside the pool. Images
+    that aliases (see image_aliases) maps to an earlier one share its data
+    URI instead of being encoded again.
+    """
+    metrics = metrics or Metrics(enabled=False)
+    aliases = aliases or {}
+    paths = {name: (paths or {}).get(name, folder / name) for name in filenames}
+    found = [name for name in filenames if (folder / name).exists()]
+    copies = {name: aliases[name] for name in found
+              if aliases.get(name, name) != name and aliases[name] in found}
+    cached = {}
+    if cache is not None:
+        for name in found:
+            if name in copies:
+                continue
+            with metrics.stage("cache", item=name) as counts:
+                data_uri = cache.get(paths[name])
+                counts["bytes_out"] = len(data_uri or "")
+            if data_uri is not None:
+                cached[name] = data_uri
+    to_encode = [name for name in found if name not in cached and name not in copies]
+
+    use_pool = jobs > 1 and len(to_encode) > 1
+    if use_pool:
+        from concurrent.futures import ProcessPoolExecutor
+    with (ProcessPoolExecutor(max_workers=jobs) if use_pool else nullcontext()) as pool:
+        mapper = pool.map if pool else map
+        encoded = iter(mapper(_timed_encode, [paths[name] for name in to_encode]))
+
+        data_uris = {}
+        for filename in filenames:
+            if filename in copies:
+                print(f"✓ Encoding {filename}... (same as {copies[filename]})")
+                data_uris[filename] = data_uris[copies[filename]]
+            elif filename in cached:
+                print(f"✓ Encoding {filename}... (cached)")
+                data_uris[filename] = cached[filename]
+            elif filename in found:
+                print(f"✓ Encoding {filename}...")
+                data_uris[filename], wall, cpu, rss = next(encoded)
+                metrics.add("encode", wall, cpu, paths[filename].stat().st_size,
+                            len(data_uris[filename]), rss, filename)
+                if cache is not None and data_uris[filename]:
+                    cache.put(paths[filename], data_uris[filename])
+            else:
+                print(f"✗ Warning: {filename} not found - using placeholder")
+                data_uris[filename] = ""
+
+    if copies:
+        print(f"🔁 {len(copies)} duplicate images encoded once, "
+              f"{sum(paths[name].stat().st_size for name in copies) / 1024:.1f} KB not re-encoded")
+    if cache is not None:
+        cache.save()
+        print(f"💾 Cache: {cache.hits} hits, {cache.misses} misses")
+    return data_uris
+
+def export_image_asset(path: Path, folder: Path) -> str:
+    """Place an image in folder as <contenthash>.<ext> and return that name
+
+    The asset is a hardlink to the original where possible; otherwise it is
+    copied with shutil.copyfile, which uses zero-copy sendfile on Linux.
+    Existing assets are left alone since their name is their content. The
+    extension follows the sniffed type, so servers label misnamed files
+    correctly.
+    """
+    from blog_sniff import HEADER_BYTES, sniff, suffix_for
+
+    with open(path, "rb") as f:
+        mime = sniff(f.read(HEADER_BYTES))[0]
+        f.seek(0)
+        digest = hashlib.file_digest(f, "sha256").hexdigest()[:16]
+    name = f"{digest}{suffix_for(path, mime)}"
+    target = folder / name
+    if not target.exists():
+        folder.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(path, target)
+        except OSError:
+            import shutil
+
+            tmp = folder / f".{name}.tmp"
+            shutil.copyfile(path, tmp)
+            os.replace(tmp, target)
+    return name
+
+def write_asset(data: bytes, folder: Path, suffix: str) -> str:
+    """Write generated data to folder as <contenthash><suffix> and return that name"""
+    name = f"{hashlib.sha256(data).hexdigest()[:16]}{suffix}"
+    target = folder / name
+    if not target.exists():
+        folder.mkdir(parents=True, exist_ok=True)
+        tmp = folder / f".{name}.tmp"
+        tmp.write_bytes(data)
+        os.replace(tmp, target)
+    return name
+
+def image_sources(filenames, folder: Path, out_dir: Path, mode: str = "inline",
+                  inline_max_bytes: int = inline_max_kb * 1024, jobs: int = 1,
+                  cache: DataURICache = None, substitutes: dict = None, metrics: Metrics = None,
+                  aliases: dict = None) -> dict:
+    """Map each image to the src used in the pages, keyed by filename
+
+    mode "inline" embeds every image as a data URI, "external" links every
+    image as assets/<contenthash>.<ext>, and "hybrid" inlines only images
+    up to inline_max_bytes and links the rest. Missing images map to "".
+    Inlined images are read from substitutes (filename -> Path) if given.
+    Duplicates named by aliases are encoded once or share one asset.
+    """
+    metrics = metrics or Metrics(enabled=False)
+    aliases = aliases or {}
+    if mode == "inline":
+        return encode_images(filenames, folder, jobs=jobs, cache=cache, paths=substitutes, metrics=metrics,
+                             aliases=aliases)
+
+    found = [name for name in filenames if (folder / name).exists()]
+    small = [name for name in found
+             if mode == "hybrid" and (folder / name).stat().st_size <= inline_max_bytes]
+    sources = encode_images(small, folder, jobs=jobs, cache=cache, paths=substitutes,
+                            metrics=metrics, aliases=aliases) if small else {}
+    for filename in filenames:
+        if filename in sources:
+            continue
+        original = aliases.get(filename, filename)
+        if original != filename and sources.get(original):
+            print(f"✓ Linking {filename} → {sources[original]} (same as {original})")
+            sources[filename] = sources[original]
+        elif filename in found:
+            with metrics.stage("link", (folder / filename).stat().st_size, item=filename):
+                name = export_image_asset(folder / filename, out_dir / assets_dir)
+            print(f"✓ Linking {filename} → {assets_dir}/{name}")
+            sources[filename] = f"{assets_dir}/{name}"
+        else:
+            print(f"✗ Warning: {filename} not found - using placeholder")
+            sources[filename] = ""
+    return {name: sources[name] for name in filenames}
+
+def picture_sources(result: dict, folder: Path) -> dict:
+    """Link the optimized variants of an image into folder as srcset lists"""
+    by_format = {}
+    for variant in result["variants"]:
+        name = export_image_asset(Path(variant["path"]), folder)
+        by_format.setdefault(variant["format"], []).append(f"{assets_dir}/{name} {variant['width']}w")
+    return {
+        "width": result["width"],
+        "height": result["height"],
+        "sources": [(MIME_TYPES[fmt], ", ".join(srcset)) for fmt, srcset in by_format.items()],
+    }
+
+def image_dimensions(sources: dict, folder: Path, paths: dict = None) -> dict:
+    """(width, height) of each image as served, read from its header
+
+    Inlined images are sniffed from the start of their data URI, so they
+    cost no extra read; linked and streamed ones read HEADER_BYTES of the
+    file (from paths, filename -> Path, if named there). Images in formats
+    browsers cannot display are reported.
+    """
+    from blog_sniff import HEADER_BYTES, UNSUPPORTED, sniff, sniff_file
+
+    paths = paths or {}
+    dimensions = {}
+    for name, src in sources.items():
+        if not src:
+            continue
+        if src.startswith("data:") and not STREAM_MARK.fullmatch(src):
+            mime, size = sniff(base64.b64decode(src.partition(",")[2][:HEADER_BYTES // 3 * 4]))
+        else:
+            mime, size = sniff_file(paths.get(name, folder / name))
+        if mime in UNSUPPORTED:
+            print(f"⚠️  {name} is {mime}, which most browsers cannot display - convert it to PNG/JPEG"
+                  " or build with --optimize")
+        if size:
+            dimensions[name] = size
+    return dimensions
+
+def placeholder_src(size, preview: dict = None) -> str:
+    """An SVG data URI the size of the image: its blurred thumbnail, else a flat colour
+
+    preview is a blog_images.placeholder() result, or None without Pillow.
+    """
+    width, height = size
+    color = preview["color"] if preview else placeholder_color
+    svg = (f"<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 {width} {height}'>"
+           f"<rect width='100%' height='100%' fill='{color}'/>")
+    if preview:
+        svg += (f"<filter id='b'><feGaussianBlur stdDeviation='{max(width, height) / 40:.0f}'/></filter>"
+                f"<image href='{preview['thumb']}' width='100%' height='100%' "
+                "preserveAspectRatio='none' filter='url(#b)'/>")
+    return "data:image/svg+xml," + urllib.parse.quote(svg + "</svg>", safe=" ='/:;,()+")
+
+def image_helpers(sources: dict, pictures: dict = None, dimensions: dict = None,
+                  aliases: dict = None, repeats: dict = None, placeholders: dict = None) -> dict:
+    """Template helpers that place images, or nothing if missing
+
+    sources maps filenames to data URIs or asset URLs; linked assets are
+    loaded lazily and decoded off the main thread. pictures maps
+    filenames to optimized variants (see picture_sources), emitted as a
+    <picture> with one srcset per format. Images get width/height from
+    the picture or from dimensions, so the page reserves their space.
+    Filenames are looked up through aliases (see image_aliases).
+
+    A data URI already shown on the page is not embedded again: the
+    repeat copies the first <img>'s src with a one-line script. repeats
+    collects {data URI: [element id, repeat count]}; the caller must put
+    the id on the first <img> with that src (see render_post).
+
+    If placeholders is given (image name -> blog_images.placeholder(), or
+    a flat colour for missing names), data URIs of known size go in
+    data-src behind a placeholder src, for lazy-images.js to swap in.
+    """
+    pictures = pictures or {}
+    dimensions = dimensions or {}
+    aliases = aliases or {}
+    repeats = {} if repeats is None else repeats
+    shown = set()
+
+    def figure(arg):
+        filename, _, alt = arg.partition("|")
+        filename = aliases.get(filename.strip(), filename.strip())
+        src = sources.get(filename, "")
+        if not src:
+            return ""
+        picture = pictures.get(filename)
+        size = (picture["width"], picture["height"]) if picture else dimensions.get(filename)
+        size = f' width="{size[0]}" height="{size[1]}"' if size else ""
+        if src.startswith("data:"):
+            lazy = placeholders is not None and filename in dimensions
+            if lazy:
+                stand_in = placeholder_src(dimensions[filename], placeholders.get(filename))
+            if src in shown:
+                repeat = repeats.setdefault(src, [f"image-{len(repeats) + 1}", 0])
+                repeat[1] += 1
+                if lazy:
+                    return f'<img src="{stand_in}" data-same-as="{repeat[0]}" alt="{html.escape(alt.strip())}"{size}>'
+                return (f'<img alt="{html.escape(alt.strip())}"{size}><script>document.currentScript'
+                        f'.previousElementSibling.src=document.getElementById("{repeat[0]}").src</script>')
+            shown.add(src)
+            if lazy:
+                return f'<img data-src="{src}" src="{stand_in}" alt="{html.escape(alt.strip())}"{size}>'
+            return f'<img src="{src}" alt="{html.escape(alt.strip())}"{size}>'
+        img = f'<img src="{src}" alt="{html.escape(alt.strip())}"{size} loading="lazy" decoding="async">'
+        if not picture:
+            return img
+        srcsets = "".join(f'<source type="{mime}" srcset="{srcset}" sizes="{picture_sizes}">'
+                          for mime, srcset in picture["sources"])
+        return f"<picture>{srcsets}{img}</picture>"
+
+    def hero_background(filename):
+        src = sources.get(aliases.get(filename, filename), "")
+        if not src:
+            return ""
+        return (' style="background-image: linear-gradient(rgba(0,0,0,0.5), rgba(0,0,0,0.5)), '
+                f'url(\'{src}\');"')
+
+    return {"figure": figure, "hero_background": hero_background}
+
+class Post(namedtuple("Post", "source meta body digest", defaults=("",))):
+    """A post source: front-matter metadata plus its compiled body
+
+    A named tuple rather than a dataclass: importing dataclasses alone
+    costs more than a no-op rebuild.
+    """
+    __slots__ = ()
+
+    @property
+    def output(self) -> str:
+        return self.meta.get("output") or self.source.name
+
+    @property
+    def layout(self) -> str:
+        return self.meta.get("layout") or default_layout
+
+    @property
+    def images(self) -> list:
+        return [name.strip() for name in self.meta.get("images", "").split(",") if name.strip()]
+
+def parse_front_matter(text: str):
+    """Split a post source into a metadata dict and its body
+
+    Front-matter is an optional block of ``key: value`` lines between two
+    ``---`` lines at the top of the file.
+    """
+    if not text.startswith("---\n"):
+        return {}, text
+    header, sep, body = text[4:].partition("\n---\n")
+    if not sep:
+        raise ValueError("front-matter is missing its closing ---")
+    meta = {}
+    for line in header.splitlines():
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        key, sep, value = line.partition(":")
+        if not sep:
+            raise ValueError(f"front-matter line is not 'key: value': {line!r}")
+        meta[key.strip()] = value.strip()
+    return meta, body
+
+def load_post(path: Path) -> Post:
+    """Read and compile a post source"""
+    text = path.read_text(encoding="utf-8")
+    meta, body = parse_front_matter(text)
+    if body.endswith("\n"):
+        body = body[:-1]
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return Post(path, meta, compile_template(body, str(path)), digest)
+
+def load_posts(folder: Path) -> list:
+    """Load every post source in folder, in filename order
+
+    Sources that cannot be read or parsed are reported and skipped.
+    """
+    posts = []
+    for path in sorted(folder.glob("*.html")):
+        try:
+            posts.append(load_post(path))
+        except (OSError, ValueError) as e:
+            print(f"❌ {path.name}: {e}")
+    return posts
+
+def section_html(section) -> str:
+    """Body source for one feed section: raw HTML, or {"heading", "body"}"""
+    if isinstance(section, str):
+        return section
+    if not isinstance(section, dict):
+        raise ValueError(f"section must be a string or an object, not {type(section).__name__}")
+    heading = f"<h2>{html.escape(str(section['heading']))}</h2>\n" if section.get("heading") else ""
+    return f'<section class="section">\n{heading}{section.get("body", "")}\n</section>'
+
+def feed_output(record: dict) -> str:
+    """Default page name of a feed record: a slug of its "id" or "title", else a hash of it"""
+    for key in ("id", "title"):
+        slug = re.sub(r"[^\w]+", "-", str(record.get(key) or "").lower()).strip("-_")[:80]
+        if slug:
+            return f"{slug}.html"
+    return "feed-" + hashlib.sha256(json.dumps(record, sort_keys=True).encode("utf-8")).hexdigest()[:12] + ".html"
+
+def _relative_inside(name: str) -> bool:
+    """Whether a path named by a feed record stays inside the folder it is relative to"""
+    return not (Path(name).is_absolute() or ".." in Path(name).parts)
+
+def post_from_record(record, source: Path) -> Post:
+    """Compile one feed record into a Post
+
+    A record is a JSON object with "sections" (see section_html) or a
+    "body", and optionally "images" (a list or comma-separated string),
+    "output", "layout" and any other metadata such as "title". The body
+    may use {{ figure:... }} like a post source. Without "output", the
+    page is named after the record's "id" or "title" (see feed_output),
+    so it keeps its name when other lines are added or removed.
+    """
+    if not isinstance(record, dict):
+        raise ValueError("record is not a JSON object")
+    meta = {}
+    for key, value in record.items():
+        if key in ("sections", "body"):
+            continue
+        if key == "images" and isinstance(value, list):
+            value = ", ".join(map(str, value))
+        elif isinstance(value, (dict, list)):
+            raise ValueError(f"{key!r} must be a string")
+        meta[key] = str(value)
+    output = meta.setdefault("output", feed_output(record))
+    if not _relative_inside(output):
+        raise ValueError(f"output {output!r} is outside the output folder")
+    if "layout" in meta and not _relative_inside(meta["layout"]):
+        raise ValueError(f"layout {meta['layout']!r} is outside the templates folder")
+    if "sections" in record:
+        if not isinstance(record["sections"], list):
+            raise ValueError("'sections' must be a list")
+        body = "\n".join(section_html(section) for section in record["sections"])
+    elif "body" in record:
+        body = str(record["body"])
+    else:
+        raise ValueError("record has neither 'sections' nor 'body'")
+    # Not compile_template: its cache would keep every record's body for the whole run
+    template = Template(body, str(source))
+    for part in template.parts:
+        if isinstance(part, tuple) and part[0] == "include" and part[1] and not _relative_inside(part[1]):
+            raise ValueError(f"include {part[1]!r} is outside the templates folder")
+    digest = hashlib.sha256(json.dumps(record, sort_keys=True).encode("utf-8")).hexdigest()
+    return Post(source, meta, template, digest)
+
+def read_feed(path: Path, errors: list):
+    """Yield a Post per line of a JSONL feed, one line in memory at a time
+
+    Lines that do not parse or compile, or would overwrite the page of an
+    earlier record, are reported, appended to errors as (line number,
+    message) and skipped.
+    """
+    outputs = set()
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            # Names the record in progress and error messages, e.g. feed.jsonl:12
+            source = path.with_name(f"{path.name}:{number}")
+            try:
+                post = post_from_record(json.loads(line), source)
+                if post.output in outputs:
+                    raise ValueError(f"output {post.output!r} is already used by an earlier record")
+                outputs.add(post.output)
+                yield post
+            except ValueError as e:
+                print(f"❌ {source.name}: {e}")
+                errors.append((number, str(e)))
+
+def render_post(post: Post, sources: dict, used: set = None, pictures: dict = None,
+                dimensions: dict = None, aliases: dict = None, stats: dict = None,
+                placeholders: dict = None) -> str:
+    """Render a post's body into its layout
+
+    sources maps image filenames to their src (see image_sources),
+    pictures to optimized variants, dimensions to (width, height) and
+    aliases to the first image with the same bytes. If given, used
+    collects the name of every template rendered and stats["repeated"]
+    the bytes of data URIs not embedded twice. With placeholders, figures
+    load lazily (see image_helpers) and the page gets lazy-images.js.
+    """
+    used = set() if used is None else used
+    repeats = {}
+    context = {key: html.escape(value) for key, value in post.meta.items()}
+    context.update(image_helpers(sources, pictures, dimensions, aliases, repeats, placeholders))
+
+    def include(name):
+        used.add(name)
+        return render(name, context)
+
+    context["include"] = include
+    try:
+        context["body"] = post.body.render(context)
+        used.add(post.layout)
+        page = render(post.layout, context)
+        for src, (image_id, _) in repeats.items():
+            for attr in ("data-src", "src"):
+                page = page.replace(f'<img {attr}="{src}"', f'<img id="{image_id}" {attr}="{src}"', 1)
+        if placeholders is not None and '<img data-src="' in page:
+            at = page.rfind("</body>")
+            at = at if at != -1 else len(page)
+            page = page[:at] + f"<script>\n{include('lazy-images.js')}</script>\n" + page[at:]
+        if stats is not None:
+            stats["repeated"] = sum(data_uri_length(src) * count for src, (_, count) in repeats.items())
+        return page
+    finally:
+        # include() closes over context; break the cycle so the page body
+        # is freed now rather than at the next garbage collection
+        context.clear()
+
+class BuildManifest:
+    """Records what each generated page was built from
+
+    For every output it keeps the sha256 of the post source, of each
+    template rendered into it, of each image it embeds and of the
+    generator code itself. A page is only rebuilt when one of those
+    changed. File hashes are remembered with their (size, mtime) so
+    unchanged files are not read again.
+    """
+
+    def __init__(self, path: Path, force: bool = False, options: str = ""):
+        self.path = Path(path)
+        self.force = force
+        self.options = options
+        try:
+            manifest = json.loads(self.path.read_text(encoding="utf-8"))
+            self.outputs = manifest["outputs"]
+            self.files = manifest["files"]
+        except (OSError, ValueError, KeyError):
+            self.outputs = {}
+            self.files = {}
+        self._generator = None
+
+    def file_hash(self, path: Path) -> str:
+        """sha256 of a file, or "" if it does not exist"""
+        try:
+            st = path.stat()
+        except OSError:
+            return ""
+        key = str(path.resolve())
+        record = self.files.get(key)
+        if record and record[:2] == [st.st_size, st.st_mtime_ns]:
+            return record[2]
+        with open(path, "rb") as f:
+            sha = hashlib.file_digest(f, "sha256").hexdigest()
+        self.files[key] = [st.st_size, st.st_mtime_ns, sha]
+        return sha
+
+    @property
+    def generator(self) -> str:
+        """Hash of the generator code, so code changes rebuild everything"""
+        if self._generator is None:
+            # By name, so the stage modules need not be imported to hash them
+            sources = [Path(__file__).with_name(f"{module}.py")
+                       for module in ("blog_build", "blog_templates", "blog_css", "blog_images", "blog_output",
+                                      "blog_sniff", "blog_search", "blog_sitemap")]
+            self._generator = hashlib.sha256("".join(self.file_hash(p) for p in sources).encode()).hexdigest()
+        return self._generator
+
+    def dirty_reasons(self, post: Post, folder: Path, out_dir: Path) -> list:
+        """Why post's output needs rebuilding; empty if it is up to date"""
+        output = out_dir / post.output
+        entry = self.outputs.get(str(output.resolve()))
+        if self.force:
+            return ["--force"]
+        if entry is None:
+            return ["not built before"]
+        if not output.exists():
+            return ["output missing"]
+        reasons = []
+        if entry["generator"] != self.generator:
+            reasons.append("generator changed")
+        if entry.get("options", "") != self.options:
+            reasons.append("build options changed")
+        if entry["source"] != post.digest:
+            reasons.append("post changed")
+        for name, sha in entry["templates"].items():
+            if self.file_hash(blog_templates.template_dir / name) != sha:
+                reasons.append(f"template {name} changed")
+        for name, sha in entry["images"].items():
+            if self.file_hash(folder / name) != sha:
+                reasons.append(f"image {name} changed")
+        for asset in entry.get("assets", []):
+            if not (out_dir / asset).exists():
+                reasons.append(f"asset {asset} missing")
+        return reasons
+
+    def budget_result(self, post: Post, out_dir: Path):
+        """The budget check recorded when post's output was last built, or None"""
+        entry = self.outputs.get(str((out_dir / post.output).resolve()))
+        return entry.get("budget") if entry else None
+
+    def record(self, post: Post, output: Path, templates: set, folder: Path, assets=(), budget: dict = None) -> None:
+        """Remember the inputs output was just built from, and its budget check if there was one"""
+        entry = self.outputs[str(output.resolve())] = {
+            "generator": self.generator,
+            "options": self.options,
+            "assets": sorted(assets),
+            "source": post.digest,
+            "templates": {name: self.file_hash(blog_templates.template_dir / name) for name in sorted(templates)},
+            "images": {name: self.file_hash(folder / name) for name in post.images},
+        }
+        if budget is not None:
+            entry["budget"] = budget
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps({"outputs": self.outputs, "files": self.files}), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+def write_indexes(urls, out_dir: Path, compress: bool, jobs: int, metrics: Metrics,
+                  search=None, sitemap=None) -> None:
+    """Write the search index and sitemap/feeds/index pages of the pages at urls, and report them"""
+    if search is not None:
+        search.prune(urls)
+        with metrics.stage("search") as counts:
+            stats = search.write(out_dir / search_dir, compress, jobs)
+            counts["bytes_out"] = stats["bytes"] + stats["index_bytes"]
+        search.save()
+        print(f"🔎 Search: {stats['terms']} terms from {stats['pages']} pages in {stats['shards']} shards"
+              f" ({stats['bytes'] / 1024:.1f} KB, largest {stats['largest'] / 1024:.1f} KB)")
+    if sitemap is not None:
+        sitemap.prune(urls)
+        with metrics.stage("sitemap"):
+            stats = sitemap.write(out_dir, compress, jobs)
+        sitemap.save()
+        if stats is None:
+            print("🗺️  Sitemap, feeds and index pages: metadata unchanged")
+        else:
+            print(f"🗺️  Sitemap, feeds and index pages: {stats['pages']} pages in {stats['files']} files")
+
+def build_site(posts, folder: Path, out_dir: Path, jobs: int = 1, cache: DataURICache = None,
+               manifest: BuildManifest = None, dry_run: bool = False, assets: str = "inline",
+               inline_max_bytes: int = inline_max_kb * 1024, optimize_dir: Path = None,
+               widths=None, formats=None, optimize_css: bool = False, minify: bool = False,
+               compress: bool = False, metrics: Metrics = None, pipeline: bool = False,
+               depth: int = 4, lazy_images: bool = False, search=None, sitemap=None, budget=None,
+               partial: bool = False) -> list:
+    """Encode the images of all posts once, then render and write the posts
+
+    With a manifest only posts whose inputs changed are rebuilt, and only
+    their images are encoded; dry_run just reports what would rebuild.
+    assets and inline_max_bytes choose how images are placed (see
+    image_sources). With optimize_dir, images are first resized and
+    re-encoded there: inlined images embed the best WebP variant (they
+    have no fallback, see inline_variant) and linked images get a
+    <picture> srcset. optimize_css purges and minifies each
+    page's stylesheet, keeping only the hero's rules in <head>. minify
+    strips comments and whitespace from the HTML, and compress writes
+    .gz (and .br, with the brotli package) copies next to each page.
+    Posts render on a thread pool (inline with jobs=1, so cProfile sees
+    them) and share the encoded images in memory; file writes overlap.
+    When nothing rewrites the pages after rendering (no optimize_css,
+    minify, compress, search, sitemap, budget or pipeline), inlined images
+    of MMAP_THRESHOLD bytes or more are instead streamed from disk into
+    each page as it is written (see write_streamed); those pages are
+    always rewritten.
+    With pipeline, inlined images are instead read, encoded and dropped
+    again just ahead of the posts that use them (see run_pipeline), at
+    most depth items per stage, so reads, encoding and rendering overlap.
+    lazy_images puts inlined figures behind blurred placeholders that the
+    page swaps for the real image near the viewport (see image_helpers).
+    With search, each rebuilt page's text is indexed and the index is
+    written to search_dir (see SearchIndex). With sitemap, each page's
+    title, description and hash are collected for the sitemap, feeds and
+    index pages (see SiteIndex). With budget, each final page is checked
+    against its limits and linted; in strict mode pages over budget are
+    not written. Up-to-date pages are reported with the check recorded in
+    the manifest when they were built, so the budget covers the whole
+    site. partial means posts are one batch of a
+    bigger build (see build_feed): the caller then saves the manifest and
+    writes the indexes once the last batch is done.
+    Every stage is timed into metrics if given. Pages are replaced atomically and left
+    alone when their content is unchanged. Returns the paths built.
+    """
+    metrics = metrics or Metrics(enabled=False)
+    total = len(posts)
+    urls = [post.output for post in posts]
+    if manifest is not None:
+        dirty = []
+        with metrics.stage("discover"):
+            for post in posts:
+                reasons = manifest.dirty_reasons(post, folder, out_dir)
+                if not reasons and budget is not None and manifest.budget_result(post, out_dir) is None:
+                    reasons = ["no budget check"]
+                if reasons:
+                    print(f"↻ {post.output}: {', '.join(reasons)}")
+                    dirty.append(post)
+                else:
+                    print(f"✓ {post.output}: up to date")
+                    if budget is not None and not dry_run:
+                        # Skipped pages still count towards the site's budget, with their last check
+                        budget.record(manifest.budget_result(post, out_dir), cached=True)
+        posts = dirty
+    if dry_run:
+        print(f"\n🔍 Dry run: {len(posts)} of {total} posts would rebuild")
+        return []
+    if not posts:
+        print("\n✅ All posts up to date")
+        if not partial:
+            # Settings or deleted posts can still change the indexes
+            write_indexes(urls, out_dir, compress, jobs, metrics, search, sitemap)
+        return []
+    import blog_output
+    from blog_output import write_file
+
+    if optimize_css:
+        from blog_css import optimize_page_css
+    if search is not None:
+        from blog_search import page_entry
+    if minify:
+        from blog_output import minify_html
+    if budget is not None:
+        from blog_budget import BudgetError
+    if sitemap is not None:
+        from blog_sitemap import page_meta
+    if compress:
+        from blog_output import precompress
+    if compress and not blog_output.have_brotli():
+        print("⚠️  brotli is not installed - writing .gz files only (pip install brotli)")
+
+    with metrics.stage("discover") as counts:
+        images = list(dict.fromkeys(name for post in posts for name in post.images))
+        found = {name: folder / name for name in images if (folder / name).exists()}
+        counts["bytes_in"] = sum(path.stat().st_size for path in found.values())
+        aliases = image_aliases(found)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    inline = {name for name, path in found.items()
+              if assets == "inline" or assets == "hybrid" and path.stat().st_size <= inline_max_bytes}
+    optimized = {}
+    if optimize_dir is not None:
+        with metrics.stage("optimize", counts["bytes_in"]) as optimize_counts:
+            # Duplicates (see image_aliases) share their original's variants
+            optimized = optimize_images({name: path for name, path in found.items() if aliases[name] == name},
+                                        optimize_dir, widths or blog_images.widths,
+                                        formats or blog_images.formats, jobs=jobs, inline=inline)
+            optimize_counts["bytes_out"] = sum(v["bytes"] for result in optimized.values()
+                                               for v in result["variants"])
+    # Inlined images get no <picture> fallback, so they only use formats every browser reads
+    chosen = {name: inline_variant(result) if name in inline else best_variant(result)
+              for name, result in optimized.items()}
+    substitutes = {name: Path(chosen[aliases[name]]["path"])
+                   for name in inline if chosen.get(aliases[name])}
+    # Pages nothing rewrites after rendering are written as rendered, so big
+    # inlined images are streamed into them instead of being held as data URIs
+    streamed = {}
+    if not (pipeline or optimize_css or minify or compress) and search is None and sitemap is None and budget is None:
+        streamed = {name: substitutes.get(name, found[name]) for name in inline if aliases[name] == name}
+        streamed = {name: path for name, path in streamed.items() if path.stat().st_size >= MMAP_THRESHOLD}
+    placeholders = None
+    if lazy_images:
+        if not blog_images.have_pillow():
+            print("⚠️  Pillow is not installed - lazy images get flat placeholders (pip install Pillow)")
+        with metrics.stage("placeholder") as placeholder_counts:
+            placeholders = make_placeholders({name: found[name] for name in inline if aliases[name] == name}, jobs)
+            placeholder_counts["bytes_out"] = sum(len(p["thumb"]) for p in placeholders.values())
+    if pipeline:
+        # Only linked and missing images are placed up front
+        rest = [name for name in images if name not in inline]
+        sources = image_sources(rest, folder, out_dir, mode="external", jobs=jobs,
+                                metrics=metrics, aliases=aliases) if rest else {}
+    else:
+        rest = [name for name in images if aliases.get(name) not in streamed]
+        sources = image_sources(rest, folder, out_dir, mode=assets, inline_max_bytes=inline_max_bytes,
+                                jobs=jobs, cache=cache, substitutes=substitutes, metrics=metrics,
+                                aliases=aliases) if rest else {}
+    stream_paths = list(streamed.values())
+    marks = {name: stream_mark(index, path) for index, (name, path) in enumerate(streamed.items())}
+    for name in images:
+        if aliases.get(name) in streamed:
+            print(f"✓ Streaming {name} into the pages")
+            sources[name] = marks[aliases[name]]
+    pictures = {name: picture_sources(result, out_dir / assets_dir)
+                for name, result in optimized.items()
+                if sources.get(name) and not sources[name].startswith("data:")}
+    with metrics.stage("discover"):
+        dimensions = image_dimensions(sources, folder, {name: streamed[aliases[name]] for name in images
+                                                        if aliases.get(name) in streamed})
+
+    def build(post):
+        used = set()
+        page_assets = []
+        render_stats = {}
+        with metrics.stage("render", len(post.body.source), item=post.output) as counts:
+            html_content = render_post(post, sources, used, pictures, dimensions, aliases, render_stats,
+                                       placeholders)
+            counts["bytes_out"] = len(html_content)
+        css_stats = None
+        if optimize_css:
+            def stylesheet_href(css):
+                page_assets.append(f"{assets_dir}/{write_asset(css.encode('utf-8'), out_dir / assets_dir, '.css')}")
+                return page_assets[-1]
+
+            with metrics.stage("css", len(html_content), item=post.output) as counts:
+                html_content, css_stats = optimize_page_css(
+                    html_content, stylesheet_href if assets != "inline" else None)
+                counts["bytes_out"] = len(html_content)
+        entries = {}
+        if search is not None:
+            with metrics.stage("search", len(html_content), item=post.output):
+                entries["search"] = page_entry(html_content, search.max_terms)
+        sizes = {"raw": len(html_content.encode("utf-8"))}
+        if minify:
+            with metrics.stage("minify", sizes["raw"], item=post.output) as counts:
+                html_content = minify_html(html_content)
+                sizes["minified"] = counts["bytes_out"] = len(html_content.encode("utf-8"))
+        if budget is not None:
+            with metrics.stage("budget", len(html_content), item=post.output):
+                served = {}
+                for name in dict.fromkeys(post.images):
+                    src = sources.get(aliases.get(name, name), "")
+                    if src.startswith("data:"):
+                        served[name] = len(src)
+                    elif src and (out_dir / src).is_file():
+                        served[name] = (out_dir / src).stat().st_size
+                entries["budget"] = budget.check(post.output, html_content, served, out_dir)
+            if budget.strict and entries["budget"]["violations"]:
+                raise BudgetError(entries["budget"])
+        output = out_dir / post.output
+        if streamed and STREAM_MARK.search(html_content):
+            # Always rewritten: comparing with the old page would mean encoding it all first
+            with metrics.stage("write", len(html_content), item=post.output) as counts:
+                counts["bytes_out"] = write_streamed(output, html_content, stream_paths)
+            return output, used, page_assets, css_stats, sizes, True, render_stats["repeated"], entries
+        data = html_content.encode("utf-8")
+        if sitemap is not None:
+            entries["sitemap"] = page_meta(html_content, data)
+        with metrics.stage("write", len(data), item=post.output) as counts:
+            changed = write_file(output, data)
+            counts["bytes_out"] = len(data) if changed else 0
+        if compress:
+            copies = {suffix: output.with_name(output.name + suffix)
+                      for suffix in (".gz", ".br") if suffix == ".gz" or blog_output.have_brotli()}
+            # An unchanged page keeps its existing compressed copies
+            if changed or not all(path.exists() for path in copies.values()):
+                with metrics.stage("compress", len(data), item=post.output) as counts:
+                    for suffix, blob in precompress(data, jobs).items():
+                        if blob is not None:
+                            write_file(copies[suffix], blob)
+                            counts["bytes_out"] += len(blob)
+            for suffix, path in copies.items():
+                sizes[suffix] = path.stat().st_size
+                page_assets.append(post.output + suffix)
+        return output, used, page_assets, css_stats, sizes, changed, render_stats["repeated"], entries
+
+    def attempt(post):
+        try:
+            return build(post)
+        except Exception as e:
+            return e
+
+    written = []
+    repeated_total = 0
+
+    def finish(post, outcome):
+        nonlocal repeated_total
+        if budget is not None and isinstance(outcome, BudgetError):
+            budget.record(outcome.result)
+            return
+        if isinstance(outcome, Exception):
+            print(f"❌ Error building {post.source.name}: {outcome}")
+            return
+        output, used, page_assets, css_stats, sizes, changed, repeated, entries = outcome
+        print(f"\n✅ Generated: {output.name}")
+        print(f"📂 File size: {os.path.getsize(output) / 1024:.1f} KB"
+              + ("" if changed else " (unchanged, not rewritten)"))
+        saved = sum(bytes_saved(optimized[name], chosen[name])
+                    for name in dict.fromkeys(aliases.get(name, name) for name in post.images) if name in optimized)
+        if saved:
+            print(f"🗜️  Images: saved {saved / 1024:.1f} KB")
+        if repeated:
+            print(f"🔁 Repeated images: saved {repeated / 1024:.1f} KB")
+            repeated_total += repeated
+        if css_stats:
+            print(f"🎨 CSS: {css_stats['original'] / 1024:.1f} KB → {css_stats['critical'] / 1024:.1f} KB critical"
+                  f" + {css_stats['deferred'] / 1024:.1f} KB deferred")
+        if len(sizes) > 1:
+            steps = [f"raw {sizes['raw'] / 1024:.1f} KB"]
+            if "minified" in sizes:
+                steps.append(f"minified {sizes['minified'] / 1024:.1f} KB")
+            compressed = [f"{name} {sizes[suffix] / 1024:.1f} KB"
+                          for suffix, name in ((".gz", "gzip"), (".br", "brotli")) if suffix in sizes]
+            if compressed:
+                steps.append(", ".join(compressed))
+            print(f"📦 HTML: {' → '.join(steps)}")
+        if budget is not None:
+            budget.record(entries["budget"])
+        written.append(output)
+        if search is not None:
+            search.update(post.output, entries["search"])
+        if sitemap is not None:
+            sitemap.update(post.output, entries["sitemap"],
+                           post.source.stat().st_mtime if post.source.exists() else None)
+        if manifest is not None:
+            # Inlined images may already have left a pipeline's sources
+            linked = [src for src in (sources.get(aliases.get(name, name), "") for name in post.images)
+                      if src and not src.startswith("data:")]
+            linked += [src.split()[0] for name in map(aliases.get, post.images, post.images) if name in pictures
+                       for _, srcset in pictures[name]["sources"] for src in srcset.split(", ")]
+            manifest.record(post, output, used, folder, linked + page_assets, entries.get("budget"))
+
+    if pipeline:
+        import asyncio
+
+        from blog_pipeline import run_pipeline
+
+        cache_lock = threading.Lock()
+
+        def read_image(name):
+            path = substitutes.get(name, folder / name)
+            if cache is not None:
+                with cache_lock, metrics.stage("cache", item=name) as counts:
+                    data_uri = cache.get(path)
+                    counts["bytes_out"] = len(data_uri or "")
+                if data_uri is not None:
+                    return data_uri
+            if path.stat().st_size >= MMAP_THRESHOLD:
+                return (path,)
+            with metrics.stage("read", item=name) as counts:
+                data = path.read_bytes()
+                counts["bytes_in"] = counts["bytes_out"] = len(data)
+            return path, data
+
+        def store_image(name, result):
+            if isinstance(result, str):
+                print(f"✓ Encoding {name}... (cached)")
+                data_uri = result
+            else:
+                print(f"✓ Encoding {name}...")
+                data_uri, wall, cpu, rss = result
+                path = substitutes.get(name, folder / name)
+                metrics.add("encode", wall, cpu, path.stat().st_size, len(data_uri), rss, name)
+                if cache is not None and data_uri:
+                    with cache_lock:
+                        cache.put(path, data_uri)
+            dimensions.update(image_dimensions({name: data_uri}, folder))
+            return data_uri
+
+        def images_of(post):
+            # Duplicates are prepared once, under the first name with their bytes
+            return list(dict.fromkeys(aliases[name] for name in post.images if name in inline))
+
+        asyncio.run(run_pipeline(posts, images_of, read_image, _timed_encode, store_image, attempt, finish,
+                                 sources, jobs=jobs, depth=depth))
+        if cache is not None:
+            cache.save()
+            print(f"💾 Cache: {cache.hits} hits, {cache.misses} misses")
+    else:
+        if jobs > 1:
+            from concurrent.futures import ThreadPoolExecutor
+        with (ThreadPoolExecutor(max_workers=jobs) if jobs > 1 else nullcontext()) as pool:
+            outcomes = pool.map(attempt, posts) if pool else map(attempt, posts)
+            for post, outcome in zip(posts, outcomes):
+                finish(post, outcome)
+
+    if repeated_total:
+        print(f"\n🔁 Repeated images: {repeated_total / 1024:.1f} KB not embedded twice this build")
+    if not partial:
+        write_indexes(urls, out_dir, compress, jobs, metrics, search, sitemap)
+    if manifest is not None and not partial:
+        manifest.save()
+    return written
+
+def build_feed(feed: Path, folder: Path, out_dir: Path, batch: int = 64, manifest: BuildManifest = None,
+               search=None, sitemap=None, dry_run: bool = False,
+               **options) -> list:
+    """Build a page per record of a JSONL feed, batch records at a time
+
+    Records are read, rendered and written one batch after another, so
+    memory holds one batch of pages (plus the images they share) however
+    long the feed is. Bad records are reported and skipped; a page that
+    fails to build is reported by build_site. options are passed on to
+    build_site. Returns the paths built.
+    """
+    errors = []
+    written = []
+    urls = []
+    posts = read_feed(feed, errors)
+    try:
+        while chunk := list(itertools.islice(posts, batch)):
+            urls += [post.output for post in chunk]
+            written += build_site(chunk, folder, out_dir, manifest=manifest, search=search, sitemap=sitemap,
+                                  dry_run=dry_run, partial=True, **options)
+    finally:
+        if manifest is not None and not dry_run:
+            manifest.save()
+    if not dry_run:
+        write_indexes(urls, out_dir, options.get("compress", False), options.get("jobs", 1),
+                      options.get("metrics") or Metrics(enabled=False), search, sitemap)
+    print(f"\n📰 Feed: {len(urls)} valid records, {len(written)} pages built, {len(errors)} bad records")
+    return written
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Kerala Floods Blog Generator")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="encode images in N processes and render posts in N threads (default: 1)")
+    parser.add_argument("--posts", default=posts_dir,
+                        help=f"folder of post sources to build (default: {posts_dir})")
+    parser.add_argument("--feed", metavar="FILE",
+                        help="build one page per record of a JSONL feed instead of --posts")
+    parser.add_argument("--feed-batch", type=int, default=64,
+                        help="--feed records read and built at a time (default: %(default)s)")
+    parser.add_argument("-o", "--out-dir", default=".",
+                        help="folder to write the generated pages to (default: current folder)")
+    parser.add_argument("--assets", choices=("inline", "external", "hybrid"), default="inline",
+                        help="embed images as data URIs, link them as hashed files in "
+                             f"{assets_dir}/, or inline only small ones (default: inline)")
+    parser.add_argument("--inline-max-kb", type=float, default=inline_max_kb,
+                        help=f"largest image --assets hybrid still inlines (default: {inline_max_kb})")
+    parser.add_argument("--optimize", action="store_true",
+                        help="resize images and re-encode them to AVIF/WebP first (needs Pillow)")
+    parser.add_argument("--widths", default=",".join(map(str, blog_images.widths)),
+                        help="comma-separated --optimize variant widths (default: %(default)s)")
+    parser.add_argument("--formats", default=",".join(blog_images.formats),
+                        help="comma-separated --optimize formats, best first (default: %(default)s)")
+    parser.add_argument("--lazy-images", action="store_true",
+                        help="show inlined figures as blurred placeholders (with Pillow) until "
+                             "they scroll near the viewport")
+    parser.add_argument("--optimize-css", action="store_true",
+                        help="drop unused CSS, minify the rest and defer all but the hero's rules")
+    parser.add_argument("--minify", action="store_true",
+                        help="strip comments and insignificant whitespace from the HTML")
+    parser.add_argument("--compress", action="store_true",
+                        help="also write max-level .gz/.br copies of each page for gzip_static/brotli_static")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="stream images through an async read/encode/render pipeline, holding only "
+                             "the images of the next few posts in memory")
+    parser.add_argument("--pipeline-depth", type=int, default=4,
+                        help="items each --pipeline stage may queue (default: %(default)s)")
+    parser.add_argument("--profile", action="store_true",
+                        help="print wall/CPU time, bytes and peak RSS per build stage")
+    parser.add_argument("--metrics-json", metavar="FILE",
+                        help="write the per-stage metrics (and per-image/page entries) to FILE as JSON")
+    parser.add_argument("--cprofile", metavar="FILE",
+                        help="run the build under cProfile, save the stats to FILE and print the top "
+                             "functions (use -j 1 to include rendering)")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="also report the peak Python heap, via tracemalloc (slows the build)")
+    parser.add_argument("--search", action="store_true",
+                        help=f"write a client-side search index and its loader to {search_dir}/")
+    parser.add_argument("--search-shard-kb", type=float, default=search_shard_kb,
+                        help="split search index shards past this size (default: %(default)s)")
+    parser.add_argument("--search-terms", type=int, default=search_max_terms,
+                        help="index at most N distinct terms per page, heaviest first (default: %(default)s)")
+    parser.add_argument("--site-url", metavar="URL",
+                        help="public URL of the output folder; also writes sitemap.xml, feed.xml (Atom), "
+                             "rss.xml and paginated index pages")
+    parser.add_argument("--site-title", default=site_title,
+                        help="title of the feeds and index pages (default: %(default)s)")
+    parser.add_argument("--index-per-page", type=int, default=index_per_page,
+                        help="posts per index page (default: %(default)s)")
+    parser.add_argument("--budget", action="store_true",
+                        help="check each page against the size/DOM budgets below, lint it, and warn")
+    parser.add_argument("--budget-strict", action="store_true",
+                        help="like --budget, but do not write pages over budget and exit with status 1")
+    parser.add_argument("--budget-report", metavar="FILE",
+                        help="write the budget results of every page built to FILE as JSON")
+    for key, help_text in (("total_kb", "KB per page, HTML plus linked images and stylesheets"),
+                           ("inline_images_kb", "KB of inline (data URI) images per page"),
+                           ("css_kb", "KB of CSS per page, inline and linked"),
+                           ("dom_nodes", "elements per page"),
+                           ("image_kb", "KB per image, inline or linked")):
+        parser.add_argument(f"--budget-{key.replace('_', '-')}", dest=f"budget_{key}",
+                            type=int if key == "dom_nodes" else float,
+                            default=budget_limits[key], help=f"budget: {help_text} (default: %(default)s)")
+    parser.add_argument("--force", action="store_true",
+                        help="rebuild every post even if its inputs are unchanged")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="list the posts that would rebuild and why, without building")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"re-encode every image instead of reusing {cache_dir}/")
+    parser.add_argument("--cache-max-mb", type=float, default=cache_max_mb,
+                        help=f"evict cached images past this size (default: {cache_max_mb})")
+    parser.add_argument("-w", "--watch", action="store_true",
+                        help="keep running and rebuild affected pages when files change")
+    parser.add_argument("--serve", action="store_true",
+                        help="after building, serve the output folder over HTTP from memory "
+                             "(ETags, gzip/brotli, ranges); with -w, pages reload as they rebuild")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="address --serve listens on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=8000,
+                        help="port --serve listens on (default: %(default)s)")
+    parser.add_argument("--serve-cache-mb", type=float, default=256,
+                        help="memory --serve may hold files in (default: %(default)s)")
+    parser.add_argument("--poll", action="store_true",
+                        help="watch by polling file stats instead of inotify")
+    parser.add_argument("--debounce", type=float, default=200,
+                        help="wait for N ms of quiet before rebuilding in --watch mode (default: 200)")
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.pipeline_depth < 1:
+        parser.error("--pipeline-depth must be at least 1")
+    if args.feed_batch < 1:
+        parser.error("--feed-batch must be at least 1")
+    if args.index_per_page < 1:
+        parser.error("--index-per-page must be at least 1")
+    if args.search_shard_kb <= 0 or args.search_terms < 1:
+        parser.error("--search-shard-kb and --search-terms must be positive")
+    try:
+        args.widths = tuple(int(w) for w in args.widths.split(","))
+    except ValueError:
+        parser.error("--widths must be comma-separated integers")
+    args.formats = tuple(f.strip().lower() for f in args.formats.split(",") if f.strip())
+    return args
+
+def build(args, cwd: Path) -> list:
+    """Load the posts and build every page that needs it"""
+    metrics = Metrics(enabled=args.profile or bool(args.metrics_json))
+    with profiled(metrics, cwd / args.cprofile if args.cprofile else None, args.tracemalloc):
+        written = _build(args, cwd, metrics)
+    if args.profile:
+        metrics.print_report()
+    if args.metrics_json:
+        metrics.write_json(cwd / args.metrics_json)
+        print(f"📊 Metrics written to {args.metrics_json}")
+    return written
+
+def _build(args, cwd: Path, metrics: Metrics) -> list:
+    if args.feed:
+        if not (cwd / args.feed).is_file():
+            print(f"❌ Feed not found: {cwd / args.feed}")
+            return []
+        print(f"Building posts from feed: {cwd / args.feed}")
+    else:
+        with metrics.stage("load") as counts:
+            posts = load_posts(cwd / args.posts)
+            counts["bytes_in"] = sum(post.source.stat().st_size for post in posts)
+        if not posts:
+            print(f"❌ No posts found in {cwd / args.posts}")
+            return []
+        print(f"Building {len(posts)} posts from: {cwd / args.posts}")
+    print(f"Looking for images in: {cwd}")
+
+    cache = None if args.no_cache else DataURICache(cwd / cache_dir, int(args.cache_max_mb * 1024 * 1024))
+    inline_max_bytes = int(args.inline_max_kb * 1024)
+    options = f"assets={args.assets}" + (f",inline<={inline_max_bytes}" if args.assets == "hybrid" else "")
+    if args.optimize:
+        options += f",optimize={'/'.join(map(str, args.widths))}:{'/'.join(args.formats)}"
+    if args.lazy_images:
+        options += ",lazy"
+    if args.optimize_css:
+        options += ",css"
+    if args.minify:
+        options += ",minify"
+    if args.compress:
+        options += ",compress"
+    if args.search:
+        options += f",search={args.search_terms}"
+    if args.site_url:
+        options += ",sitemap"
+    budget = None
+    if args.budget or args.budget_strict or args.budget_report:
+        from blog_budget import Budget
+
+        budget = Budget({key: getattr(args, f"budget_{key}") for key in budget_limits}, args.budget_strict)
+        # Pages built before the budget (or under other limits) are checked again
+        options += ",budget=" + "/".join(f"{value:g}" for value in budget.limits.values())
+    manifest = BuildManifest(cwd / cache_dir / manifest_file, force=args.force, options=options)
+    search = sitemap = None
+    if args.search:
+        from blog_search import SearchIndex
+
+        search = SearchIndex(cwd / cache_dir / "search.json", int(args.search_shard_kb * 1024), args.search_terms)
+    if args.site_url:
+        from blog_sitemap import SiteIndex
+
+        sitemap = SiteIndex(cwd / cache_dir / "sitemap.json", args.site_url, args.site_title, args.index_per_page)
+    settings = dict(jobs=args.jobs, cache=cache, manifest=manifest, dry_run=args.dry_run, assets=args.assets,
+                    inline_max_bytes=inline_max_bytes,
+                    optimize_dir=cwd / cache_dir / "optimized" if args.optimize else None,
+                    widths=args.widths, formats=args.formats, optimize_css=args.optimize_css,
+                    minify=args.minify, compress=args.compress, metrics=metrics,
+                    pipeline=args.pipeline, depth=args.pipeline_depth, lazy_images=args.lazy_images,
+                    search=search, sitemap=sitemap, budget=budget)
+    if args.feed:
+        written = build_feed(cwd / args.feed, cwd, cwd / args.out_dir, batch=args.feed_batch, **settings)
+    else:
+        written = build_site(posts, cwd, cwd / args.out_dir, **settings)
+    if budget is not None and not args.dry_run:
+        budget.print_summary()
+        if args.budget_report:
+            budget.write_report(cwd / args.budget_report)
+            print(f"📊 Budget report written to {args.budget_report}")
+        if budget.failed and not args.watch:
+            raise SystemExit(1)
+    return written
+
+def watch_site(args, cwd: Path) -> None:
+    """Rebuild affected pages whenever posts, templates or images change"""
+    from blog_watch import PollingWatcher, open_watcher, watch
+
+    out_dir = (cwd / args.out_dir).resolve()
+    skip = {(cwd / cache_dir).resolve(), out_dir / "__pycache__", out_dir / assets_dir, out_dir / search_dir}
+    # Reports each build writes would otherwise trigger the next one
+    skip |= {(cwd / name).resolve() for name in (args.metrics_json, args.cprofile, args.budget_report) if name}
+
+    def ignore(path: Path) -> bool:
+        # Our own outputs, the cache, VCS folders and editor swap files
+        return (path.name.startswith(".") or path.name.endswith("~")
+                or path in skip or path.parent == out_dir and path.suffix in (".html", ".gz", ".br", ".xml"))
+
+    folders = [cwd, blog_templates.template_dir]
+    watcher = open_watcher(folders, ignore, poll=args.poll)
+    kind = "polling" if isinstance(watcher, PollingWatcher) else "inotify"
+    print(f"\n👀 Watching {cwd} for changes ({kind}, Ctrl+C to stop)")
+
+    def rebuild(changed, first):
+        names = sorted(str(p.relative_to(cwd)) if p.is_relative_to(cwd) else p.name for p in changed)
+        print(f"\n🔄 Changed: {', '.join(names)}")
+        start = time.perf_counter()
+        # Templates may have been edited; post bodies are recompiled on load
+        blog_templates.load_template.cache_clear()
+        try:
+            written = build(args, cwd)
+        except Exception as e:
+            # Keep watching; the next save may fix it
+            print(f"❌ Build failed: {type(e).__name__}: {e}")
+            return
+        end = time.perf_counter()
+        print(f"⚡ Rebuilt {len(written)} pages in {(end - start) * 1000:.0f} ms "
+              f"({(end - first) * 1000:.0f} ms after first change)")
+
+    try:
+        watch(watcher, rebuild, debounce=args.debounce / 1000)
+    except KeyboardInterrupt:
+        print("\n👋 Stopped watching")
+    finally:
+        watcher.close()
+
+def serve_site(args, cwd: Path, background: bool = False):
+    """Serve the output folder until Ctrl+C, or on a daemon thread if background"""
+    import asyncio
+
+    from blog_serve import serve
+
+    out_dir = cwd / args.out_dir
+    listening = threading.Event()
+
+    def started(server):
+        print(f"\n🌐 Serving {out_dir} at http://{args.host}:{args.port}/ (Ctrl+C to stop)")
+        listening.set()
+
+    def run():
+        asyncio.run(serve(out_dir, args.host, args.port, int(args.serve_cache_mb * 1024 * 1024), started))
+
+    if background:
+        thread = threading.Thread(target=run, name="serve", daemon=True)
+        thread.start()
+        # Report a port in use before watching starts
+        while not listening.wait(0.1) and thread.is_alive():
+            pass
+        return
+    try:
+        run()
+    except KeyboardInterrupt:
+        print("\n👋 Stopped serving")
+
+def main(argv=None):
+    args = parse_args(argv)
+    cwd = Path.cwd()
+    written = build(args, cwd)
+    if written:
+        print(f"\n✅ Success! Generated {len(written)} pages")
+        print(f"🌐 Open {written[0].name} in your browser to view the blog")
+        print("\n📤 Ready to host online:")
+        print("   • Drag & drop to netlify.com/drop")
+        print("   • Upload to GitHub Pages") 
+        print("   • Use with any web hosting service")
+    if args.dry_run:
+        return
+    if args.serve:
+        serve_site(args, cwd, background=args.watch)
+    if args.watch:
+        watch_site(args, cwd)
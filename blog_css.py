@@ -0,0 +1,326 @@
+"""
+CSS stage for the blog generator
+Drops rules whose selectors match nothing in the rendered page, minifies
+the rest and splits out the critical (above-the-fold hero) rules so they
+can stay inline in <head> while everything else is deferred.
+"""
+import re
+from html.parser import HTMLParser
+
+# Quoted strings pass through every transformation untouched
+STRING = r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\''
+STRING_RE = re.compile(STRING, re.S)
+COMMENT_OR_STRING = re.compile(rf"({STRING})|/\*.*?\*/", re.S)
+STRING_SPLIT = re.compile(rf"({STRING})", re.S)
+
+# At-rules whose block holds more rules rather than declarations
+GROUPING_AT_RULES = ("@media", "@supports", "@layer", "@container", "@document")
+
+# Pseudo-classes/elements and attribute selectors are not checked against the page
+PSEUDO = re.compile(r"::?[\w-]+(\((?:[^()]|\([^()]*\))*\))?")
+ATTRIBUTE = re.compile(r"\[[^\]]*\]")
+COMPOUND = re.compile(r"[^\s>+~]+")
+SIMPLE = re.compile(r"([.#]?)(-?[\w-]+|\*)")
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+             "meta", "source", "track", "wbr"}
+
+STYLE_BLOCK = re.compile(r"<style>(.*?)</style>", re.S)
+
+
+class Rule:
+    """A style rule, at-rule or grouping at-rule (children set) from a stylesheet"""
+
+    def __init__(self, prelude: str, body: str = None, children: list = None):
+        self.prelude = prelude
+        self.body = body
+        self.children = children
+
+    @property
+    def is_style(self) -> bool:
+        return not self.prelude.startswith("@")
+
+
+class DomIndex(HTMLParser):
+    """Tags, classes and ids used in a page, overall and in the hero
+
+    The critical set holds the first element with a "hero" class, all of
+    its descendants and its ancestors - what renders above the fold.
+    """
+
+    def __init__(self, page: str, critical_class: str = "hero"):
+        super().__init__(convert_charrefs=True)
+        self.critical_class = critical_class
+        self.all = {"tags": {"html", "body"}, "classes": set(), "ids": set()}
+        self.critical = {"tags": {"html", "body"}, "classes": set(), "ids": set()}
+        self._stack = []
+        self._critical_depth = None
+        self._critical_done = False
+        self.feed(page)
+        self.close()
+
+    @staticmethod
+    def _add(index, tag, classes, id_):
+        index["tags"].add(tag)
+        index["classes"].update(classes)
+        if id_:
+            index["ids"].add(id_)
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+        element = (tag, classes, attrs.get("id"))
+        self._add(self.all, *element)
+        if self._critical_depth is None and not self._critical_done and self.critical_class in classes:
+            for ancestor in self._stack:
+                self._add(self.critical, *ancestor)
+            self._critical_depth = len(self._stack)
+        if self._critical_depth is not None:
+            self._add(self.critical, *element)
+        if tag not in VOID_TAGS:
+            self._stack.append(element)
+
+    def handle_endtag(self, tag):
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                del self._stack[i:]
+                break
+        if self._critical_depth is not None and len(self._stack) <= self._critical_depth:
+            self._critical_depth = None
+            self._critical_done = True
+
+
+def strip_comments(css: str) -> str:
+    return COMMENT_OR_STRING.sub(lambda m: m.group(1) or "", css)
+
+
+def _scan_to(css: str, pos: int, stops: str) -> int:
+    """Index of the first stop character at nesting depth 0, skipping strings"""
+    depth = 0
+    while pos < len(css):
+        ch = css[pos]
+        if ch in "\"'":
+            match = STRING_RE.match(css, pos)
+            pos = match.end() if match else len(css)
+            continue
+        if ch in stops and depth == 0:
+            return pos
+        if ch in "({":
+            depth += 1
+        elif ch in ")}":
+            depth -= 1
+        pos += 1
+    return pos
+
+
+def parse(css: str) -> list:
+    """Parse a stylesheet into a list of Rules"""
+    rules, _ = _parse(strip_comments(css), 0)
+    return rules
+
+
+def _parse(css: str, pos: int):
+    rules = []
+    while True:
+        while pos < len(css) and css[pos].isspace():
+            pos += 1
+        if pos >= len(css):
+            return rules, pos
+        if css[pos] == "}":
+            return rules, pos + 1
+        end = _scan_to(css, pos, "{;}")
+        prelude = css[pos:end].strip()
+        if end >= len(css) or css[end] != "{":
+            if prelude:
+                rules.append(Rule(prelude))
+            # Leave a closing brace for the enclosing block to consume
+            pos = end if end < len(css) and css[end] == "}" else end + 1
+            continue
+        if prelude.lower().startswith(GROUPING_AT_RULES):
+            children, pos = _parse(css, end + 1)
+            rules.append(Rule(prelude, children=children))
+        else:
+            close = _scan_to(css, end + 1, "}")
+            rules.append(Rule(prelude, body=css[end + 1:close]))
+            pos = close + 1
+
+
+def split_selectors(prelude: str) -> list:
+    selectors = []
+    pos = 0
+    while pos <= len(prelude):
+        end = _scan_to(prelude, pos, ",")
+        if prelude[pos:end].strip():
+            selectors.append(prelude[pos:end].strip())
+        pos = end + 1
+    return selectors
+
+
+def selector_matches(selector: str, index: dict) -> bool:
+    """Conservatively decide whether selector can match the indexed page
+
+    Each compound of the selector must use only tags, classes and ids the
+    page has; combinators, pseudo-classes and attributes are ignored, so
+    this may keep a rule that matches nothing but never drops a used one.
+    """
+    selector = ATTRIBUTE.sub("", PSEUDO.sub("", selector))
+    for compound in COMPOUND.findall(selector):
+        for prefix, name in SIMPLE.findall(compound):
+            if name == "*":
+                continue
+            if prefix == ".":
+                if name not in index["classes"]:
+                    return False
+            elif prefix == "#":
+                if name not in index["ids"]:
+                    return False
+            elif name.lower() not in index["tags"]:
+                return False
+    return True
+
+
+def purge(rules: list, index: dict, keep: set = frozenset()) -> list:
+    """Drop selectors that cannot match the page, and rules left empty
+
+    Selectors naming a class in keep (added by scripts, say) are kept.
+    @keyframes are kept only if a remaining rule refers to them.
+    """
+    def walk(rules):
+        out = []
+        for rule in rules:
+            if rule.children is not None:
+                children = walk(rule.children)
+                if children:
+                    out.append(Rule(rule.prelude, children=children))
+            elif rule.is_style:
+                selectors = [s for s in split_selectors(rule.prelude)
+                             if selector_matches(s, index) or any(f".{k}" in s for k in keep)]
+                if selectors:
+                    out.append(Rule(", ".join(selectors), body=rule.body))
+            else:
+                out.append(rule)
+        return out
+
+    kept = walk(rules)
+    used_text = " ".join(rule.body for rule in _flatten(kept) if rule.is_style and rule.body)
+
+    def drop_unused_keyframes(rules):
+        out = []
+        for rule in rules:
+            if rule.children is not None:
+                rule = Rule(rule.prelude, children=drop_unused_keyframes(rule.children))
+            elif re.match(r"@(-\w+-)?keyframes\s", rule.prelude):
+                name = rule.prelude.split(None, 1)[1].strip()
+                if not re.search(rf"(?<![\w-]){re.escape(name)}(?![\w-])", used_text):
+                    continue
+            out.append(rule)
+        return out
+
+    return drop_unused_keyframes(kept)
+
+
+def _flatten(rules):
+    for rule in rules:
+        if rule.children is not None:
+            yield from _flatten(rule.children)
+        else:
+            yield rule
+
+
+def split_critical(rules: list, index: dict):
+    """Partition rules into (critical, deferred) by the hero's elements
+
+    Keyframes and other at-rules follow the style rules that use them.
+    """
+    def walk(rules):
+        critical, deferred = [], []
+        for rule in rules:
+            if rule.children is not None:
+                crit, rest = walk(rule.children)
+                if crit:
+                    critical.append(Rule(rule.prelude, children=crit))
+                if rest:
+                    deferred.append(Rule(rule.prelude, children=rest))
+            elif rule.is_style:
+                if any(selector_matches(s, index) for s in split_selectors(rule.prelude)):
+                    critical.append(rule)
+                else:
+                    deferred.append(rule)
+            else:
+                deferred.append(rule)
+        return critical, deferred
+
+    critical, deferred = walk(rules)
+    critical_text = " ".join(r.body for r in _flatten(critical) if r.is_style and r.body)
+    moved = []
+    for rule in deferred:
+        if rule.children is None and not rule.is_style and " " in rule.prelude:
+            name = rule.prelude.split(None, 1)[1].strip()
+            if re.search(rf"(?<![\w-]){re.escape(name)}(?![\w-])", critical_text):
+                moved.append(rule)
+    critical += moved
+    deferred = [rule for rule in deferred if rule not in moved]
+    return critical, deferred
+
+
+def _minify_text(text: str, punctuation: str) -> str:
+    """Collapse whitespace and drop it around punctuation, outside strings"""
+    parts = STRING_SPLIT.split(text)
+    for i in range(0, len(parts), 2):
+        part = re.sub(r"\s+", " ", parts[i])
+        parts[i] = re.sub(rf"\s*([{re.escape(punctuation)}])\s*", r"\1", part)
+    return "".join(parts).strip()
+
+
+def minify(rules: list) -> str:
+    """Serialize rules with no optional whitespace or trailing semicolons"""
+    out = []
+    for rule in rules:
+        if rule.children is not None:
+            out.append(f"{_minify_text(rule.prelude, ':,')}{{{minify(rule.children)}}}")
+        elif rule.body is None:
+            out.append(f"{_minify_text(rule.prelude, ',')};")
+        else:
+            prelude = _minify_text(rule.prelude, ",>" if rule.is_style else ":,")
+            body = _minify_text(rule.body, "{}:;,").replace(";}", "}").rstrip(";")
+            out.append(f"{prelude}{{{body}}}")
+    return "".join(out)
+
+
+def optimize_page_css(page: str, stylesheet_href=None, keep: set = frozenset()):
+    """Purge, minify and split the first <style> block of a rendered page
+
+    Critical rules stay in the <head> <style>. The deferred rest goes in a
+    <style> just before </body>, or, if stylesheet_href is given, it is
+    called with the deferred CSS and the returned URL is preloaded and
+    applied asynchronously. Returns (page, stats) with byte counts.
+    """
+    match = STYLE_BLOCK.search(page)
+    if not match:
+        return page, None
+    original = match.group(1)
+    index = DomIndex(page)
+    rules = purge(parse(original), index.all, keep)
+    critical, deferred = split_critical(rules, index.critical)
+    critical_css, deferred_css = minify(critical), minify(deferred)
+
+    head = f"<style>{critical_css}</style>"
+    tail = ""
+    if deferred_css:
+        if stylesheet_href is not None:
+            href = stylesheet_href(deferred_css)
+            head += (f'\n    <link rel="preload" href="{href}" as="style" '
+                     f'onload="this.onload=null;this.rel=\'stylesheet\'">'
+                     f'\n    <noscript><link rel="stylesheet" href="{href}"></noscript>')
+        else:
+            tail = f"<style>{deferred_css}</style>\n"
+    page = page[:match.start()] + head + page[match.end():]
+    if tail:
+        at = page.rfind("</body>")
+        page = page[:at] + tail + page[at:] if at != -1 else page + tail
+    stats = {
+        "original": len(original.encode("utf-8")),
+        "critical": len(critical_css.encode("utf-8")),
+        "deferred": len(deferred_css.encode("utf-8")),
+    }
+    return page, stats
@@ -0,0 +1,208 @@
+"""
+Image optimization stage for the blog generator
+Downscales figures to the widths they are shown at and re-encodes them
+to AVIF/WebP, and makes the tiny previews shown while lazy images load.
+Needs Pillow (pip install Pillow); without it the stage is skipped and
+images are used as they are. Pillow is only imported once a stage needs
+it, so builds that never touch pixels do not pay for loading it.
+"""
+import base64
+import hashlib
+import io
+import os
+from pathlib import Path
+
+# Set by have_pillow()
+Image = ImageOps = None
+_pillow_checked = False
+
+# Variant widths; the page .container is at most 1200px wide
+widths = (480, 800, 1200)
+
+# Output formats, best first
+formats = ("avif", "webp")
+quality = 75
+
+MIME_TYPES = {"avif": "image/avif", "webp": "image/webp"}
+
+# Formats an inlined image may use: it is a bare <img src> with no
+# <picture> fallback, and browsers without AVIF would show nothing
+inline_formats = ("webp",)
+
+# Longest side of the blurred thumbnail shown while a lazy image loads
+placeholder_size = 16
+
+
+def have_pillow() -> bool:
+    """Import Pillow on first call; False if it is not installed"""
+    global Image, ImageOps, _pillow_checked
+    if not _pillow_checked:
+        _pillow_checked = True
+        try:
+            from PIL import Image, ImageOps
+        except ImportError:
+            pass
+    return Image is not None
+
+
+def supported_formats(wanted=formats) -> list:
+    """The formats in wanted that this Pillow build can write"""
+    if not have_pillow():
+        return []
+    if "avif" in wanted:
+        try:
+            import pillow_avif  # noqa: F401 - adds AVIF to Pillow < 11.2
+        except ImportError:
+            pass
+    Image.init()
+    return [fmt for fmt in wanted if fmt.upper() in Image.SAVE]
+
+
+def optimize_image(path: Path, folder: Path, widths=widths, formats=formats, quality: int = quality) -> dict:
+    """Write resized, re-encoded variants of path into folder
+
+    Variants are named <sha256[:16]>-<width>.<format>, so an unchanged
+    image is not processed again. Images are never upscaled and are turned
+    upright per their EXIF orientation first. Returns the original size and
+    the upright dimensions plus the variants, best format first and widest
+    last within each format.
+    """
+    with open(path, "rb") as f:
+        digest = hashlib.file_digest(f, "sha256").hexdigest()[:16]
+    folder.mkdir(parents=True, exist_ok=True)
+    have_pillow()
+
+    variants = []
+    with Image.open(path) as original:
+        img = ImageOps.exif_transpose(original)
+        width, height = img.size
+        targets = sorted({min(w, width) for w in widths})
+        for fmt in formats:
+            for w in targets:
+                out = folder / f"{digest}-{w}.{fmt}"
+                if not out.exists():
+                    resized = img if w == width else img.resize(
+                        (w, max(1, round(height * w / width))), Image.LANCZOS)
+                    if resized.mode not in ("RGB", "RGBA"):
+                        resized = resized.convert("RGBA" if "A" in resized.getbands() else "RGB")
+                    tmp = out.with_name(f".{out.name}.tmp")
+                    resized.save(tmp, format=fmt.upper(), quality=quality)
+                    os.replace(tmp, out)
+                variants.append({"format": fmt, "width": w, "path": str(out), "bytes": out.stat().st_size})
+    return {"bytes": path.stat().st_size, "width": width, "height": height, "variants": variants}
+
+
+def best_variant(result: dict, allowed=None):
+    """The smallest full-width variant (in allowed formats, if given), or None if none beats the original"""
+    variants = [v for v in result["variants"] if allowed is None or v["format"] in allowed]
+    if not variants:
+        return None
+    widest = max(v["width"] for v in variants)
+    best = min((v for v in variants if v["width"] == widest), key=lambda v: v["bytes"])
+    return best if best["bytes"] < result["bytes"] else None
+
+
+def inline_variant(result: dict, allowed=inline_formats):
+    """The variant embedded for an inlined image, or None if none beats the original"""
+    return best_variant(result, allowed)
+
+
+def bytes_saved(result: dict, variant: dict = None) -> int:
+    """Bytes saved by serving variant (default: the best variant) instead of the original"""
+    variant = variant or best_variant(result)
+    return result["bytes"] - variant["bytes"] if variant else 0
+
+
+def _optimize(args):
+    path, folder, widths, formats = args
+    try:
+        return optimize_image(path, folder, widths, formats)
+    except Exception as e:
+        return e
+
+
+def optimize_images(paths: dict, folder: Path, widths=widths, formats=formats, jobs: int = 1,
+                    inline=()) -> dict:
+    """Optimize each image in paths (name -> Path), in a process pool if jobs > 1
+
+    Prints the bytes saved per image and in total, counting the variant
+    that is served: inline_variant for names in inline, best_variant for
+    the rest. Images that fail to optimize are reported and left out of
+    the result.
+    """
+    formats = supported_formats(formats)
+    if not formats:
+        print("⚠️  Pillow with WebP/AVIF support is not installed - skipping image optimization")
+        return {}
+
+    tasks = [(path, folder, tuple(widths), tuple(formats)) for path in paths.values()]
+    use_pool = jobs > 1 and len(tasks) > 1
+    if use_pool:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            outcomes = list(pool.map(_optimize, tasks))
+    else:
+        outcomes = [_optimize(task) for task in tasks]
+
+    results = {}
+    before = after = 0
+    for name, outcome in zip(paths, outcomes):
+        if isinstance(outcome, Exception):
+            print(f"✗ Warning: could not optimize {name}: {outcome}")
+            continue
+        results[name] = outcome
+        best = inline_variant(outcome) if name in inline else best_variant(outcome)
+        size = outcome["bytes"] - bytes_saved(outcome, best)
+        before += outcome["bytes"]
+        after += size
+        if best:
+            print(f"🗜️  {name}: {outcome['bytes'] / 1024:.1f} KB → {size / 1024:.1f} KB"
+                  f" ({best['format']} {best['width']}w, saved {(1 - size / outcome['bytes']) * 100:.0f}%)")
+        else:
+            print(f"🗜️  {name}: {outcome['bytes'] / 1024:.1f} KB, already smaller than any variant")
+    if before:
+        print(f"🗜️  Images: {before / 1024:.1f} KB → {after / 1024:.1f} KB, saved {(before - after) / 1024:.1f} KB")
+    return results
+
+
+def placeholder(path: Path, size: int = placeholder_size) -> dict:
+    """A tiny PNG thumbnail (as a data URI) and the average colour of path
+
+    JPEGs are decoded at reduced scale, so this stays cheap for large
+    photos. The thumbnail is turned upright per its EXIF orientation.
+    """
+    have_pillow()
+    with Image.open(path) as img:
+        img.draft("RGB", (size, size))
+        thumb = ImageOps.exif_transpose(img.convert("RGB"))
+    thumb.thumbnail((size, size), Image.BOX)
+    red, green, blue = thumb.resize((1, 1), Image.BOX).getpixel((0, 0))
+    out = io.BytesIO()
+    thumb.save(out, format="PNG", optimize=True)
+    return {
+        "color": f"#{red:02x}{green:02x}{blue:02x}",
+        "thumb": "data:image/png;base64," + base64.b64encode(out.getvalue()).decode("ascii"),
+    }
+
+
+def _placeholder(path):
+    try:
+        return placeholder(path)
+    except Exception as e:
+        return e
+
+
+def make_placeholders(paths: dict, jobs: int = 1) -> dict:
+    """placeholder() for each image in paths (name -> Path), in a process pool if jobs > 1
+
+    Returns {} without Pillow. Images Pillow cannot read are left out.
+    """
+    if not have_pillow():
+        return {}
+    if jobs > 1 and len(paths) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            outcomes = list(pool.map(_placeholder, paths.values()))
+    else:
+        outcomes = [_placeholder(path) for path in paths.values()]
+    return {name: outcome for name, outcome in zip(paths, outcomes) if not isinstance(outcome, Exception)}
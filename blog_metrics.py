@@ -0,0 +1,162 @@
+"""
+Instrumentation for the blog generator's --profile and --metrics-json
+Records wall time, CPU time, bytes in/out and peak RSS per build stage,
+and can wrap a build in cProfile and tracemalloc.
+"""
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    resource = None  # not on Windows
+
+# Stages in report order; any other stage name is listed after these
+STAGES = ("load", "discover", "cache", "optimize", "placeholder", "read", "encode", "link", "render", "search", "css", "minify", "budget", "compress", "write", "sitemap")
+
+
+def peak_rss() -> int:
+    """Peak resident set size of this process so far, in bytes (0 if unknown)"""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def timed(function, *args):
+    """Call function(*args) and return (result, wall_s, cpu_s, peak_rss)
+
+    CPU time is this thread's, so the numbers hold inside thread and
+    process pools alike.
+    """
+    wall, cpu = time.perf_counter(), time.thread_time()
+    result = function(*args)
+    return result, time.perf_counter() - wall, time.thread_time() - cpu, peak_rss()
+
+
+class Metrics:
+    """Per-stage totals, plus one entry per item for stages that name them
+
+    A disabled instance accepts the same calls and records nothing, so
+    build code can be instrumented unconditionally.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.stages = {}
+        self.items = {}
+        self.python_peak = None
+        self._lock = threading.Lock()
+        self._start = (time.perf_counter(), time.process_time())
+
+    def add(self, stage: str, wall: float, cpu: float, bytes_in: int = 0, bytes_out: int = 0,
+            rss: int = 0, item: str = None) -> None:
+        """Record one call of stage, timed by the caller (e.g. in a worker process)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            total = self.stages.setdefault(stage, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0,
+                                                   "bytes_in": 0, "bytes_out": 0, "peak_rss": 0})
+            total["calls"] += 1
+            total["wall_s"] += wall
+            total["cpu_s"] += cpu
+            total["bytes_in"] += bytes_in
+            total["bytes_out"] += bytes_out
+            total["peak_rss"] = max(total["peak_rss"], rss)
+            if item is not None:
+                self.items.setdefault(stage, []).append({
+                    "item": item, "wall_s": wall, "cpu_s": cpu,
+                    "bytes_in": bytes_in, "bytes_out": bytes_out, "peak_rss": rss,
+                })
+
+    @contextmanager
+    def stage(self, stage: str, bytes_in: int = 0, item: str = None):
+        """Time the with-block as one call of stage
+
+        Yields a dict whose "bytes_in"/"bytes_out" the block can fill in.
+        """
+        counts = {"bytes_in": bytes_in, "bytes_out": 0}
+        if not self.enabled:
+            yield counts
+            return
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield counts
+        finally:
+            self.add(stage, time.perf_counter() - wall, time.thread_time() - cpu,
+                     counts["bytes_in"], counts["bytes_out"], peak_rss(), item)
+
+    def to_dict(self) -> dict:
+        import platform  # slow to import; only --metrics-json needs it
+
+        wall, cpu = time.perf_counter() - self._start[0], time.process_time() - self._start[1]
+        order = list(STAGES) + sorted(set(self.stages) - set(STAGES))
+        return {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "started": time.time() - wall,
+            "total": {"wall_s": wall, "cpu_s": cpu, "peak_rss": peak_rss(),
+                      "python_peak": self.python_peak},
+            "stages": {name: self.stages[name] for name in order if name in self.stages},
+            "items": self.items,
+        }
+
+    def write_json(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=2), encoding="utf-8")
+
+    def print_report(self) -> None:
+        data = self.to_dict()
+        print("\n⏱️  Build profile")
+        print(f"   {'stage':<10} {'calls':>6} {'wall ms':>9} {'cpu ms':>9} {'in KB':>10} {'out KB':>10} {'peak RSS MB':>12}")
+        for name, s in data["stages"].items():
+            print(f"   {name:<10} {s['calls']:>6} {s['wall_s'] * 1000:>9.1f} {s['cpu_s'] * 1000:>9.1f}"
+                  f" {s['bytes_in'] / 1024:>10.1f} {s['bytes_out'] / 1024:>10.1f} {s['peak_rss'] / 2**20:>12.1f}")
+        total = data["total"]
+        print(f"   {'total':<10} {'':>6} {total['wall_s'] * 1000:>9.1f} {total['cpu_s'] * 1000:>9.1f}"
+              f" {'':>10} {'':>10} {total['peak_rss'] / 2**20:>12.1f}")
+        if total["python_peak"] is not None:
+            print(f"   Python heap peak (tracemalloc): {total['python_peak'] / 2**20:.1f} MB")
+
+
+@contextmanager
+def profiled(metrics: Metrics, cprofile_path: Path = None, trace_memory: bool = False, top: int = 15):
+    """Run the with-block under cProfile and/or tracemalloc
+
+    cProfile sees the calling thread only. Its stats are dumped to
+    cprofile_path (for pstats/snakeviz) and the top functions by
+    cumulative time are printed. The tracemalloc peak goes into metrics.
+    """
+    # Imported here so unprofiled builds do not load them
+    profiler = tracing = None
+    if cprofile_path:
+        import cProfile
+        import io
+        import pstats
+        profiler = cProfile.Profile()
+    if trace_memory:
+        import tracemalloc
+        tracing = not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+            cprofile_path.parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(cprofile_path)
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(top)
+            print(f"\n🔬 cProfile (saved to {cprofile_path}):")
+            print(out.getvalue().rstrip())
+        if tracing:
+            metrics.python_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
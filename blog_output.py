@@ -0,0 +1,226 @@
+"""
+Output stage for the blog generator
+HTML minification, precompressed .gz/.br variants (so a server with
+gzip_static/brotli_static can send pages without compressing them on
+every request) and atomic writes. Brotli needs the optional brotli package,
+which is only imported once something is compressed.
+"""
+import gzip
+import hashlib
+import os
+import re
+import struct
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+
+# Set by have_brotli()
+brotli = None
+_brotli_checked = False
+
+# Outputs at least this big are gzipped in parallel chunks (pigz-style)
+PARALLEL_GZIP_MIN = 1024 * 1024
+GZIP_CHUNK = 256 * 1024
+
+# Comments, raw-text elements kept verbatim, and tags (quoted attributes may hold '>')
+TOKEN = re.compile(
+    r"(<!--.*?-->"
+    r"|<(pre|textarea|script|style)\b(?:\"[^\"]*\"|'[^']*'|[^'\">])*>.*?</\2\s*>"
+    r"|<[a-zA-Z/!](?:\"[^\"]*\"|'[^']*'|[^'\">])*>)",
+    re.S | re.I,
+)
+TAG_NAME = re.compile(r"</?([a-zA-Z][\w-]*)")
+QUOTED = re.compile(r"(\"[^\"]*\"|'[^']*')")
+
+# Whitespace next to these tags never renders, so it can go entirely
+BLOCK_TAGS = {
+    "html", "head", "body", "meta", "link", "title", "style", "script", "noscript",
+    "section", "article", "header", "footer", "nav", "main", "aside", "div", "p",
+    "h1", "h2", "h3", "h4", "h5", "h6", "ul", "ol", "li", "table", "thead", "tbody",
+    "tfoot", "tr", "th", "td", "figure", "figcaption", "picture", "source", "br",
+    "hr", "blockquote", "pre", "textarea", "form", "template", "!doctype",
+}
+
+
+def _tag_name(tag: str) -> str:
+    if tag.lower().startswith("<!doctype"):
+        return "!doctype"
+    match = TAG_NAME.match(tag)
+    return match.group(1).lower() if match else ""
+
+
+def _minify_tag(tag: str) -> str:
+    """Collapse whitespace inside a tag, leaving attribute values alone"""
+    parts = QUOTED.split(tag)
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r"\s+", " ", parts[i]).replace(" >", ">").replace(" />", "/>")
+    return "".join(parts)
+
+
+def minify_html(page: str) -> str:
+    """Drop comments and insignificant whitespace from a page
+
+    <pre>, <textarea>, <script> and <style> contents are kept byte for
+    byte, as are conditional comments. Whitespace between inline content
+    is collapsed to one space, so text still renders the same.
+    """
+    tokens = TOKEN.split(page)
+    # split() interleaves text, whole match, and the raw-element group
+    pieces = []
+    for i in range(0, len(tokens), 3):
+        # Dropped comments render as nothing, so the text around one is joined
+        # up: "x<!-- c --> y" keeps its space, "x <!-- c --> y" gets one
+        if pieces and pieces[-1][0] == "text":
+            pieces[-1] = ("text", pieces[-1][1] + tokens[i])
+        else:
+            pieces.append(("text", tokens[i]))
+        if i + 1 < len(tokens) and not (tokens[i + 1].startswith("<!--")
+                                        and not tokens[i + 1].startswith("<!--[if")):
+            pieces.append(("tag", tokens[i + 1]))
+
+    out = []
+    for i, (kind, value) in enumerate(pieces):
+        if kind == "tag":
+            if value.startswith("<!--"):
+                out.append(value)
+                continue
+            if TOKEN.match(value).group(2):
+                out.append(value)
+            else:
+                out.append(_minify_tag(value))
+            continue
+        text = re.sub(r"\s+", " ", value)
+        before = next((pieces[j][1] for j in range(i - 1, -1, -1)
+                       if pieces[j][0] == "tag" and not pieces[j][1].startswith("<!--")), None)
+        after = next((pieces[j][1] for j in range(i + 1, len(pieces))
+                      if pieces[j][0] == "tag" and not pieces[j][1].startswith("<!--")), None)
+        if before is None or _tag_name(before) in BLOCK_TAGS:
+            text = text.lstrip()
+        if after is None or _tag_name(after) in BLOCK_TAGS:
+            text = text.rstrip()
+        out.append(text)
+    return "".join(out)
+
+
+def gzip_compress(data: bytes, level: int = 9, jobs: int = 1) -> bytes:
+    """gzip data reproducibly (mtime 0), in parallel chunks for big inputs
+
+    Chunks are deflated on a thread pool, each primed with the previous
+    32 KiB as its dictionary, and joined into one ordinary gzip member
+    the same way pigz does.
+    """
+    if jobs <= 1 or len(data) < PARALLEL_GZIP_MIN:
+        return gzip.compress(data, level, mtime=0)
+
+    view = memoryview(data)
+    starts = range(0, len(data), GZIP_CHUNK)
+    last = len(starts) - 1
+
+    def deflate(index):
+        start = starts[index]
+        if start:
+            compressor = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=bytes(view[max(0, start - 32768):start]))
+        else:
+            compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        body = compressor.compress(view[start:start + GZIP_CHUNK])
+        return body + compressor.flush(zlib.Z_FINISH if index == last else zlib.Z_SYNC_FLUSH)
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        body = b"".join(pool.map(deflate, range(len(starts))))
+    header = b"\x1f\x8b\x08\x00\x00\x00\x00\x00\x02\xff"
+    trailer = struct.pack("<II", zlib.crc32(data), len(data) & 0xFFFFFFFF)
+    return header + body + trailer
+
+
+def have_brotli() -> bool:
+    """Import brotli on first call; False if it is not installed"""
+    global brotli, _brotli_checked
+    if not _brotli_checked:
+        _brotli_checked = True
+        try:
+            import brotli
+        except ImportError:
+            pass
+    return brotli is not None
+
+
+def brotli_compress(data: bytes, quality: int = 11):
+    """Brotli (at maximum quality by default), or None without the brotli package"""
+    if not have_brotli():
+        return None
+    return brotli.compress(data, quality=quality)
+
+
+def precompress(data: bytes, jobs: int = 1) -> dict:
+    """Compress data to {".gz": bytes, ".br": bytes or None}, both at once"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        gz = pool.submit(gzip_compress, data, 9, jobs)
+        br = pool.submit(brotli_compress, data)
+        return {".gz": gz.result(), ".br": br.result()}
+
+
+def same_content(path: Path, data: bytes) -> bool:
+    """Whether path already holds exactly data (size first, then sha256)"""
+    try:
+        if path.stat().st_size != len(data):
+            return False
+        with open(path, "rb") as f:
+            return hashlib.file_digest(f, "sha256").digest() == hashlib.sha256(data).digest()
+    except OSError:
+        return False
+
+
+@contextmanager
+def atomic_open(path: Path, fsync: bool = True):
+    """Open a binary file that replaces path only once the with-block succeeds
+
+    Writes go to a temporary file in the same directory, which is fsynced
+    and then renamed over path, so readers see the old file or the new
+    one, never a partial write. Lets big outputs be streamed out in parts.
+    """
+    import tempfile  # only needed once something is written; slow to import
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            # mkstemp creates 0600; keep the old file's mode, else the usual 0644
+            try:
+                os.fchmod(f.fileno(), path.stat().st_mode & 0o777)
+            except FileNotFoundError:
+                os.fchmod(f.fileno(), 0o644)
+            except AttributeError:
+                pass  # no fchmod on Windows
+            yield f
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    if fsync and hasattr(os, "O_DIRECTORY"):
+        # Persist the rename itself
+        dir_fd = os.open(path.parent, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def write_file(path: Path, data: bytes, fsync: bool = True) -> bool:
+    """Atomically replace path with data unless it already holds it
+
+    See atomic_open. Unchanged files keep their mtime (and the ETags
+    derived from it). Returns whether the file was written.
+    """
+    if same_content(path, data):
+        return False
+    with atomic_open(path, fsync) as f:
+        f.write(data)
+    return True
+
@@ -0,0 +1,102 @@
+"""
+Async build pipeline for the blog generator's --pipeline mode
+Image reads, image encoding and page building run as asyncio stages
+joined by bounded queues, so disk I/O, encoding and rendering overlap
+while only a few posts' worth of images is ever held in memory.
+"""
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Reads in flight at once; more rarely helps a single disk
+READERS = 2
+
+
+async def run_pipeline(posts, images_of, read, encode, store, build, finish, sources: dict,
+                       jobs: int = 1, depth: int = 4) -> None:
+    """Build posts in order, preparing each image just before it is needed
+
+    images_of(post) names the images a post needs prepared. For each one,
+    read(name) runs on a thread and returns either its src (already
+    known, e.g. cached) or a tuple of arguments for encode, which runs in
+    a process pool (jobs > 1) or a thread. store(name, result) then runs
+    on a thread with either result and returns the src, which is put in
+    sources. build(post) runs on a thread pool once the post's images are
+    in sources, and finish(post, result or exception) is called in post
+    order. Each image leaves sources once every post using it is built.
+
+    Every queue holds at most depth items, so a slow stage holds the
+    earlier ones back rather than letting work pile up in memory.
+    """
+    loop = asyncio.get_running_loop()
+    read_queue = asyncio.Queue(depth)
+    encode_queue = asyncio.Queue(depth)
+    post_queue = asyncio.Queue(depth)
+    built_queue = asyncio.Queue(depth)
+    ready = {}
+    users = {}
+    for post in posts:
+        for name in images_of(post):
+            users[name] = users.get(name, 0) + 1
+
+    async def produce():
+        for post in posts:
+            for name in images_of(post):
+                if name not in ready:
+                    ready[name] = loop.create_future()
+                    await read_queue.put(name)
+            await post_queue.put(post)
+        for _ in range(READERS):
+            await read_queue.put(None)
+        await post_queue.put(None)
+
+    async def reader():
+        while (name := await read_queue.get()) is not None:
+            try:
+                await encode_queue.put((name, await asyncio.to_thread(read, name)))
+            except Exception as e:
+                ready[name].set_exception(e)
+
+    async def encoder(pool):
+        while (item := await encode_queue.get()) is not None:
+            name, result = item
+            try:
+                if isinstance(result, tuple):
+                    result = await loop.run_in_executor(pool, encode, *result)
+                sources[name] = await asyncio.to_thread(store, name, result)
+                ready[name].set_result(None)
+            except Exception as e:
+                ready[name].set_exception(e)
+
+    async def build_one(pool, post):
+        names = images_of(post)
+        try:
+            await asyncio.gather(*(ready[name] for name in names))
+            return await loop.run_in_executor(pool, build, post)
+        except Exception as e:
+            return e
+        finally:
+            for name in names:
+                users[name] -= 1
+                if not users[name]:
+                    sources.pop(name, None)
+
+    async def schedule(pool):
+        while (post := await post_queue.get()) is not None:
+            await built_queue.put((post, asyncio.create_task(build_one(pool, post))))
+        await built_queue.put(None)
+
+    async def report():
+        while (item := await built_queue.get()) is not None:
+            post, task = item
+            finish(post, await task)
+
+    encode_pool = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else ThreadPoolExecutor(max_workers=1)
+    with encode_pool, ThreadPoolExecutor(max_workers=jobs) as build_pool:
+        encoders = [asyncio.create_task(encoder(encode_pool)) for _ in range(jobs)]
+        readers = [asyncio.create_task(reader()) for _ in range(READERS)]
+        tail = asyncio.gather(schedule(build_pool), report())
+        await produce()
+        await asyncio.gather(*readers)
+        for _ in encoders:
+            await encode_queue.put(None)
+        await asyncio.gather(*encoders, tail)
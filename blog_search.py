@@ -0,0 +1,203 @@
+"""
+Client-side search index for the blog generator
+Tokenizes each rendered page (title, headings, .tech-item lists, tables
+and body text) into a compact inverted index, sharded by term prefix so
+the search.js loader fetches only the shards a query needs rather than
+the text of every page.
+"""
+import json
+import os
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+
+from blog_output import precompress, write_file
+from blog_templates import render
+
+# Shards past this size are split on a longer prefix
+shard_kb = 32
+
+# Distinct terms kept per page, heaviest first
+max_terms = 500
+
+# Weight of a term by the element it appears in; body text counts 1
+TAG_WEIGHTS = {"title": 8, "h1": 6, "h2": 4, "h3": 3, "h4": 2, "h5": 2, "h6": 2, "th": 2}
+CLASS_WEIGHTS = {"tech-item": 3, "lead": 2}
+
+# Never indexed: code, styles and content that is not shown as text
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "head"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+# Common words that would match every page; search.js drops them from queries too
+STOPWORDS = frozenset(
+    "a an and are as at be but by can for from has have how in into is it its of on or our so"
+    " that the their this to was we were what when which will with you your".split()
+)
+TOKEN = re.compile(r"[^\W_]+")
+MAX_TERM_LENGTH = 32
+
+INDEX_NAME = "index.json"
+SHARD_NAME = re.compile(r"[0-9a-f]+\.json")
+
+
+def tokenize(text: str) -> list:
+    """Lowercase words of text worth indexing"""
+    return [word for word in TOKEN.findall(text.lower())
+            if 2 <= len(word) <= MAX_TERM_LENGTH and word not in STOPWORDS]
+
+
+class PageText(HTMLParser):
+    """Weighted term counts and the <title> of a rendered page"""
+
+    def __init__(self, page: str):
+        super().__init__(convert_charrefs=True)
+        self.terms = {}
+        self.title = ""
+        self._stack = []
+        self.feed(page)
+        self.close()
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            return
+        classes = (dict(attrs).get("class") or "").split()
+        weight = max([TAG_WEIGHTS.get(tag, 0)] + [CLASS_WEIGHTS.get(c, 0) for c in classes])
+        skip = tag in SKIP_TAGS
+        if self._stack:
+            weight = max(weight, self._stack[-1][1])
+            skip = skip or self._stack[-1][2]
+        self._stack.append((tag, weight, skip))
+
+    def handle_endtag(self, tag):
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i][0] == tag:
+                del self._stack[i:]
+                break
+
+    def handle_data(self, data):
+        tag, weight, skip = self._stack[-1] if self._stack else ("", 0, False)
+        if tag == "title":
+            self.title += data
+            return
+        if skip:
+            return
+        for word in tokenize(data):
+            self.terms[word] = self.terms.get(word, 0) + max(weight, 1)
+
+
+def page_entry(page: str, max_terms: int = max_terms) -> dict:
+    """{"title", "terms"} for a rendered page, keeping its max_terms heaviest terms"""
+    text = PageText(page)
+    terms = sorted(text.terms.items(), key=lambda item: (-item[1], item[0]))[:max_terms]
+    return {"title": " ".join(text.title.split()), "terms": dict(terms)}
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def shard_terms(postings: dict, max_bytes: int) -> dict:
+    """Group postings into {prefix: {term: postings}} of at most max_bytes of JSON
+
+    Terms start out grouped by first letter; a group too big is split on
+    one more letter, recursively. Terms no longer than the prefix stay in
+    the prefix's own shard, and a single term is never split.
+    """
+    sizes = {term: len(_dumps(term)) + len(_dumps(value)) + 2 for term, value in postings.items()}
+    shards = {}
+
+    def split(prefix, terms):
+        if sum(sizes[t] for t in terms) <= max_bytes or len(terms) == 1:
+            shards[prefix] = terms
+            return
+        groups = {}
+        for term in terms:
+            groups.setdefault(term[:len(prefix) + 1], []).append(term)
+        for key, group in groups.items():
+            if key == prefix:
+                shards[prefix] = group
+            else:
+                split(key, group)
+
+    initial = {}
+    for term in sorted(postings):
+        initial.setdefault(term[:1], []).append(term)
+    for prefix, terms in initial.items():
+        split(prefix, terms)
+    return {prefix: {term: postings[term] for term in terms} for prefix, terms in sorted(shards.items())}
+
+
+class SearchIndex:
+    """Per-page terms kept between builds, written out as a sharded index
+
+    Only rebuilt pages are tokenized again; the rest keep the entry they
+    had in ``path``. ``write`` lays the index out as ``index.json`` (page
+    list, shard map, stopwords) plus one JSON file per shard, named after
+    the hex of its prefix, with {term: [page, weight, page, weight, ...]}.
+    """
+
+    def __init__(self, path: Path, shard_bytes: int = shard_kb * 1024, max_terms: int = max_terms):
+        self.path = Path(path)
+        self.shard_bytes = shard_bytes
+        self.max_terms = max_terms
+        try:
+            self.pages = json.loads(self.path.read_text(encoding="utf-8"))["pages"]
+        except (OSError, ValueError, KeyError):
+            self.pages = {}
+
+    def update(self, url: str, entry: dict) -> None:
+        self.pages[url] = entry
+
+    def prune(self, urls) -> None:
+        """Forget pages not in urls (posts that were deleted)"""
+        keep = set(urls)
+        self.pages = {url: entry for url, entry in self.pages.items() if url in keep}
+
+    def write(self, folder: Path, compress: bool = False, jobs: int = 1) -> dict:
+        """Write the index, its shards and the loader into folder
+
+        Unchanged files are not rewritten and shards that no longer exist
+        are removed. With compress, .gz/.br copies go next to each file.
+        Returns counts and sizes for reporting.
+        """
+        urls = sorted(self.pages)
+        postings = {}
+        for doc, url in enumerate(urls):
+            for term, weight in self.pages[url]["terms"].items():
+                postings.setdefault(term, []).extend((doc, weight))
+        shards = shard_terms(postings, self.shard_bytes)
+        files = {prefix: prefix.encode("utf-8").hex() + ".json" for prefix in shards}
+        index = {
+            "version": 1,
+            "pages": [[url, self.pages[url]["title"]] for url in urls],
+            "shards": files,
+            "stopwords": sorted(STOPWORDS),
+        }
+        outputs = {INDEX_NAME: _dumps(index), "search.js": render("search.js")}
+        outputs.update({files[prefix]: _dumps(terms) for prefix, terms in shards.items()})
+
+        folder.mkdir(parents=True, exist_ok=True)
+        for name, text in outputs.items():
+            data = text.encode("utf-8")
+            changed = write_file(folder / name, data)
+            if compress:
+                copies = {suffix: folder / (name + suffix) for suffix in (".gz", ".br")}
+                if changed or not copies[".gz"].exists():
+                    for suffix, blob in precompress(data, jobs).items():
+                        if blob is not None:
+                            write_file(copies[suffix], blob)
+        for path in folder.iterdir():
+            base = path.name.removesuffix(".gz").removesuffix(".br")
+            if SHARD_NAME.fullmatch(base) and base not in outputs:
+                path.unlink()
+
+        sizes = [len(outputs[name].encode("utf-8")) for name in files.values()]
+        return {"pages": len(urls), "terms": len(postings), "shards": len(shards),
+                "bytes": sum(sizes), "largest": max(sizes, default=0),
+                "index_bytes": len(outputs[INDEX_NAME].encode("utf-8"))}
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(_dumps({"pages": self.pages}), encoding="utf-8")
+        os.replace(tmp, self.path)
@@ -0,0 +1,305 @@
+"""
+Local preview server for the blog generator's --serve mode
+An asyncio HTTP/1.1 server that keeps pages and their compressed
+variants in memory, with strong ETags, 304s, Accept-Encoding negotiation
+and byte ranges, so pages can be load-tested locally as they will be
+served after deploy.
+"""
+import asyncio
+import email.utils
+import gzip
+import hashlib
+import mimetypes
+import os
+import urllib.parse
+from collections import OrderedDict
+from pathlib import Path
+
+from blog_output import brotli_compress
+
+# Files bigger than this are read from disk per request rather than cached,
+# and sent without on-the-fly compression
+MAX_CACHED_FILE = 16 * 1024 * 1024
+
+# On-the-fly compression levels: fast, since there is no .gz/.br copy to
+# reuse; --compress writes the max-level ones
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Types worth compressing on the fly when no .gz/.br copy was written
+COMPRESSIBLE = {"text/html", "text/css", "text/javascript", "application/javascript",
+                "application/json", "image/svg+xml", "application/xml", "text/xml", "text/plain"}
+
+# Precompressed siblings, in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+KEEPALIVE_TIMEOUT = 15
+MAX_HEADER_BYTES = 64 * 1024
+
+REASONS = {200: "OK", 206: "Partial Content", 304: "Not Modified", 400: "Bad Request",
+           404: "Not Found", 405: "Method Not Allowed", 416: "Range Not Satisfiable",
+           500: "Internal Server Error"}
+
+
+def file_key(path: Path, stat: os.stat_result) -> tuple:
+    """Size and mtime of path (stat) and of its .gz/.br copies, to notice any of them changing"""
+    key = [stat.st_size, stat.st_mtime_ns]
+    for _, suffix in ENCODINGS:
+        try:
+            copy = path.with_name(path.name + suffix).stat()
+            key += [copy.st_size, copy.st_mtime_ns]
+        except OSError:
+            key += [None, None]
+    return tuple(key)
+
+
+class Resource:
+    """One file's bytes, validators and encoded variants, as served
+
+    .gz/.br copies older than the file are left over from an earlier
+    build (say, one without --compress) and are ignored.
+    """
+
+    def __init__(self, path: Path, data: bytes, stat: os.stat_result):
+        self.path = path
+        self.data = data
+        self.key = file_key(path, stat)
+        self.etag = hashlib.sha256(data).hexdigest()[:20]
+        self.last_modified = email.utils.formatdate(stat.st_mtime, usegmt=True)
+        mime = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        self.content_type = f"{mime}; charset=utf-8" if mime.startswith("text/") or mime.endswith("json") else mime
+        self.encodings = {}
+        for encoding, suffix in ENCODINGS:
+            copy = path.with_name(path.name + suffix)
+            try:
+                if copy.stat().st_mtime_ns >= stat.st_mtime_ns:
+                    self.encodings[encoding] = copy.read_bytes()
+            except OSError:
+                pass
+        if mime in COMPRESSIBLE and not self.encodings and 512 < len(data) <= MAX_CACHED_FILE:
+            self.encodings["gzip"] = gzip.compress(data, GZIP_LEVEL, mtime=0)
+            br = brotli_compress(data, BROTLI_QUALITY)
+            if br is not None:
+                self.encodings["br"] = br
+
+    @property
+    def size(self) -> int:
+        return len(self.data) + sum(map(len, self.encodings.values()))
+
+
+class SiteFiles:
+    """Files under root, kept in memory (least recently used out past max_bytes)
+
+    Each lookup stats the file and its .gz/.br copies, so a rebuilt page
+    is picked up on the next request without re-reading unchanged ones. Only load() touches file
+    contents; fetch() runs it off the event loop, once per path however
+    many requests are waiting for it.
+    """
+
+    def __init__(self, root: Path, max_bytes: int = 256 * 1024 * 1024):
+        self.root = Path(root).resolve()
+        self.max_bytes = max_bytes
+        self.used = 0
+        self._cache = OrderedDict()
+        self._loading = {}
+
+    def resolve(self, url_path: str):
+        """The file a URL path names, or None if it is outside root or hidden"""
+        parts = [p for p in urllib.parse.unquote(url_path).split("/") if p]
+        if any(p.startswith(".") or "\\" in p or "\0" in p for p in parts):
+            return None
+        path = self.root.joinpath(*parts)
+        if path.is_dir():
+            path = path / "index.html"
+        return path if path.is_file() else None
+
+    def cached(self, path: Path):
+        """path's Resource if the cached copy is current, else None"""
+        resource = self._cache.get(path)
+        if resource is None:
+            return None
+        if resource.key != file_key(path, path.stat()):
+            self._forget(path)
+            return None
+        self._cache.move_to_end(path)
+        return resource
+
+    @staticmethod
+    def load(path: Path) -> Resource:
+        """Read path (and its .gz/.br copies) into a Resource"""
+        stat = path.stat()
+        return Resource(path, path.read_bytes(), stat)
+
+    async def fetch(self, path: Path) -> Resource:
+        """Load path in a thread and cache it, sharing the load with concurrent requests"""
+        task = self._loading.get(path)
+        if task is None:
+            task = self._loading[path] = asyncio.ensure_future(self._fetch(path))
+        # A client that disconnects must not cancel the others' load
+        return await asyncio.shield(task)
+
+    async def _fetch(self, path: Path) -> Resource:
+        try:
+            resource = await asyncio.to_thread(self.load, path)
+            self.add(resource)
+            return resource
+        finally:
+            del self._loading[path]
+
+    def add(self, resource: Resource) -> None:
+        """Keep resource for later requests, unless it is too big to cache"""
+        if len(resource.data) > MAX_CACHED_FILE:
+            return
+        if resource.path in self._cache:
+            self._forget(resource.path)
+        self._cache[resource.path] = resource
+        self.used += resource.size
+        while self.used > self.max_bytes and len(self._cache) > 1:
+            self._forget(next(iter(self._cache)))
+
+    def _forget(self, path: Path) -> None:
+        self.used -= self._cache.pop(path).size
+
+
+def parse_range(header: str, size: int):
+    """(start, end) of a single "bytes=" range, None to ignore it, or False if unsatisfiable"""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None  # multipart ranges are answered with the whole file
+    first, dash, last = spec.strip().partition("-")
+    if not dash:
+        return None
+    try:
+        if not first:
+            length = int(last)
+            return (max(0, size - length), size - 1) if length > 0 and size else False
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    return (start, end) if start <= end and start < size else False
+
+
+def accepted_encodings(header: str) -> set:
+    """Content codings an Accept-Encoding header allows"""
+    allowed = set()
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0 and name.strip():
+            allowed.add(name.strip().lower())
+    return allowed
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against etag (quoted)"""
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+async def respond(files: SiteFiles, method: str, target: str, headers: dict):
+    """(status, headers, body) for one request"""
+    if method not in ("GET", "HEAD"):
+        return 405, {"Allow": "GET, HEAD"}, b""
+    path = files.resolve(urllib.parse.urlsplit(target).path)
+    if path is None:
+        return 404, {"Content-Type": "text/plain; charset=utf-8"}, b"Not found\n"
+    resource = files.cached(path) or await files.fetch(path)
+
+    out = {"Content-Type": resource.content_type, "Last-Modified": resource.last_modified,
+           "Cache-Control": "no-cache", "Accept-Ranges": "bytes"}
+    body, etag = resource.data, resource.etag
+    range_header = headers.get("range")
+    if resource.encodings:
+        out["Vary"] = "Accept-Encoding"
+        if not range_header:
+            allowed = accepted_encodings(headers.get("accept-encoding", ""))
+            for encoding, _ in ENCODINGS:
+                if (encoding in allowed or "*" in allowed) and encoding in resource.encodings:
+                    body, etag = resource.encodings[encoding], f"{resource.etag}-{encoding}"
+                    out["Content-Encoding"] = encoding
+                    break
+    out["ETag"] = f'"{etag}"'
+
+    if "if-none-match" in headers:
+        if etag_matches(headers["if-none-match"], out["ETag"]):
+            return 304, out, b""
+    elif headers.get("if-modified-since") == resource.last_modified:
+        return 304, out, b""
+
+    if range_header and headers.get("if-range", out["ETag"]) == out["ETag"]:
+        span = parse_range(range_header, len(body))
+        if span is False:
+            out["Content-Range"] = f"bytes */{len(body)}"
+            return 416, out, b""
+        if span is not None:
+            start, end = span
+            out["Content-Range"] = f"bytes {start}-{end}/{len(body)}"
+            return 206, out, memoryview(body)[start:end + 1]
+    return 200, out, body
+
+
+async def handle(files: SiteFiles, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Serve requests on one connection until it closes or idles out"""
+    try:
+        while True:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT)
+            except (asyncio.IncompleteReadError, asyncio.TimeoutError, asyncio.LimitOverrunError):
+                return
+            lines = head.decode("latin-1").split("\r\n")
+            try:
+                method, target, version = lines[0].split(" ")
+            except ValueError:
+                writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                return
+            headers = {}
+            for line in lines[1:]:
+                name, _, value = line.partition(":")
+                if name:
+                    headers[name.strip().lower()] = value.strip()
+            if "content-length" in headers:
+                # Bodies are ignored, but must be consumed to keep the connection in sync
+                await reader.readexactly(int(headers["content-length"]))
+
+            try:
+                status, out, body = await respond(files, method, target, headers)
+            except OSError:
+                status, out, body = 500, {"Content-Type": "text/plain; charset=utf-8"}, b"Read error\n"
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection != "close" and (version == "HTTP/1.1" or connection == "keep-alive")
+            if status != 304:
+                out["Content-Length"] = str(len(body))
+            out["Date"] = email.utils.formatdate(usegmt=True)
+            out["Connection"] = "keep-alive" if keep_alive else "close"
+            lines = [f"HTTP/1.1 {status} {REASONS[status]}"] + [f"{k}: {v}" for k, v in out.items()]
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+            if method != "HEAD" and status != 304:
+                writer.write(body)
+            await writer.drain()
+            if not keep_alive:
+                return
+    except (ConnectionError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(root: Path, host: str = "127.0.0.1", port: int = 8000, max_bytes: int = 256 * 1024 * 1024,
+                started=None) -> None:
+    """Serve root over HTTP until cancelled; started(server) is called once listening"""
+    files = SiteFiles(root, max_bytes)
+    server = await asyncio.start_server(lambda r, w: handle(files, r, w), host, port,
+                                        limit=MAX_HEADER_BYTES, backlog=1024)
+    if started is not None:
+        started(server)
+    async with server:
+        await server.serve_forever()
@@ -0,0 +1,212 @@
+"""
+Sitemap, feeds and index pages for the blog generator
+Collects each page's title, description and content hash as it is
+built, and writes sitemap.xml (split behind a sitemap index past 50,000
+URLs), an Atom and an RSS feed of the newest posts, and a paginated
+index.html, only when that metadata has changed.
+"""
+import hashlib
+import html
+import json
+import os
+import re
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote, urljoin
+
+from blog_output import atomic_open, precompress, write_file
+from blog_templates import render
+
+# Limit per sitemap file in the sitemaps.org protocol
+SITEMAP_MAX_URLS = 50_000
+
+# Newest posts in feed.xml/rss.xml, and posts per index page
+feed_size = 20
+per_page = 20
+
+TITLE = re.compile(r"<title[^>]*>(.*?)</title>", re.S | re.I)
+DESCRIPTION = re.compile(r"""<meta\s+name=["']description["']\s+content=["']([^"']*)["']""", re.I)
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+
+
+def page_meta(page: str, data: bytes) -> dict:
+    """Title and description of a rendered page, plus the sha256 of its final bytes"""
+    title = TITLE.search(page)
+    description = DESCRIPTION.search(page)
+    return {
+        "title": " ".join(html.unescape(title.group(1)).split()) if title else "",
+        "description": html.unescape(description.group(1)).strip() if description else "",
+        "hash": hashlib.sha256(data).hexdigest(),
+    }
+
+
+def _iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _escape(text: str) -> str:
+    return html.escape(text, quote=True)
+
+
+class SiteIndex:
+    """Per-page metadata kept between builds, written out as sitemap, feeds and index pages
+
+    Each entry remembers when the page was first published and when its
+    content last changed (its source's mtime where there is one), so
+    lastmod and feed dates stay put across rebuilds of unchanged pages.
+    """
+
+    def __init__(self, path: Path, site_url: str, title: str, per_page: int = per_page,
+                 feed_size: int = feed_size):
+        self.path = Path(path)
+        self.site_url = site_url.rstrip("/") + "/"
+        self.title = title
+        self.per_page = per_page
+        self.feed_size = feed_size
+        try:
+            state = json.loads(self.path.read_text(encoding="utf-8"))
+            self.pages, self.digest, self.files = state["pages"], state["digest"], state["files"]
+        except (OSError, ValueError, KeyError):
+            self.pages, self.digest, self.files = {}, "", []
+
+    def update(self, url: str, meta: dict, mtime: float = None) -> None:
+        """Record a freshly built page; mtime is its source's, if it has one
+
+        A changed page is dated by its source's mtime, unless that is no
+        newer than the page's last update (a template or generator change
+        rebuilt it), in which case the build time is used.
+        """
+        old = self.pages.get(url)
+        stamp = _iso(mtime if mtime is not None else time.time())
+        if old and old["hash"] != meta["hash"] and stamp <= old["updated"]:
+            stamp = _iso(time.time())
+        if old and old["hash"] == meta["hash"]:
+            meta = dict(meta, published=old["published"], updated=old["updated"])
+        else:
+            meta = dict(meta, published=old["published"] if old else stamp, updated=stamp)
+        self.pages[url] = meta
+
+    def prune(self, urls) -> None:
+        """Forget pages not in urls (posts that were deleted)"""
+        keep = set(urls)
+        self.pages = {url: entry for url, entry in self.pages.items() if url in keep}
+
+    def _state_digest(self) -> str:
+        settings = [self.site_url, self.title, self.per_page, self.feed_size]
+        return hashlib.sha256(json.dumps([settings, self.pages], sort_keys=True).encode("utf-8")).hexdigest()
+
+    def write(self, folder: Path, compress: bool = False, jobs: int = 1):
+        """Write everything into folder if the metadata changed; returns stats or None if skipped
+
+        Files are streamed out entry by entry, and files a smaller site no
+        longer needs (extra sitemaps or index pages) are removed.
+        """
+        digest = self._state_digest()
+        if digest == self.digest and all((folder / name).exists() for name in self.files):
+            return None
+        urls = sorted(self.pages)
+        newest = sorted(urls, key=lambda url: (self.pages[url]["published"], url), reverse=True)
+        files = self._write_sitemaps(folder, urls)
+        files += self._write_feeds(folder, newest[:self.feed_size])
+        files += self._write_index_pages(folder, newest)
+        if compress:
+            for name in files:
+                for suffix, blob in precompress((folder / name).read_bytes(), jobs).items():
+                    if blob is not None:
+                        write_file(folder / (name + suffix), blob)
+        for name in set(self.files) - set(files):
+            for suffix in ("", ".gz", ".br"):
+                (folder / (name + suffix)).unlink(missing_ok=True)
+        self.digest, self.files = digest, files
+        return {"pages": len(urls), "files": len(files),
+                "sitemaps": sum(name.startswith("sitemap") for name in files)}
+
+    def _url(self, page: str) -> str:
+        return urljoin(self.site_url, quote(page))
+
+    def _write_sitemap(self, path: Path, urls) -> None:
+        with atomic_open(path) as f:
+            f.write(f'{XML_HEADER}<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'.encode())
+            for url in urls:
+                f.write(f"<url><loc>{_escape(self._url(url))}</loc>"
+                        f"<lastmod>{self.pages[url]['updated']}</lastmod></url>\n".encode())
+            f.write(b"</urlset>\n")
+
+    def _write_sitemaps(self, folder: Path, urls: list) -> list:
+        if len(urls) <= SITEMAP_MAX_URLS:
+            self._write_sitemap(folder / "sitemap.xml", urls)
+            return ["sitemap.xml"]
+        names = []
+        for start in range(0, len(urls), SITEMAP_MAX_URLS):
+            names.append(f"sitemap-{len(names) + 1}.xml")
+            self._write_sitemap(folder / names[-1], urls[start:start + SITEMAP_MAX_URLS])
+        with atomic_open(folder / "sitemap.xml") as f:
+            f.write(f'{XML_HEADER}<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'.encode())
+            for name in names:
+                f.write(f"<sitemap><loc>{_escape(self._url(name))}</loc></sitemap>\n".encode())
+            f.write(b"</sitemapindex>\n")
+        return ["sitemap.xml"] + names
+
+    def _write_feeds(self, folder: Path, newest: list) -> list:
+        from email.utils import format_datetime  # pulls in socket; only needed here
+
+        updated = max((self.pages[url]["updated"] for url in newest), default=_iso(0))
+        with atomic_open(folder / "feed.xml") as f:
+            f.write(f'{XML_HEADER}<feed xmlns="http://www.w3.org/2005/Atom">\n'
+                    f"<title>{_escape(self.title)}</title>\n<id>{_escape(self.site_url)}</id>\n"
+                    f'<link href="{_escape(self.site_url)}"/>\n'
+                    f'<link rel="self" href="{_escape(self._url("feed.xml"))}"/>\n'
+                    f"<updated>{updated}</updated>\n<author><name>{_escape(self.title)}</name></author>\n".encode())
+            for url in newest:
+                page = self.pages[url]
+                f.write(f"<entry><title>{_escape(page['title'])}</title>"
+                        f'<link href="{_escape(self._url(url))}"/><id>{_escape(self._url(url))}</id>'
+                        f"<published>{page['published']}</published><updated>{page['updated']}</updated>"
+                        f"<summary>{_escape(page['description'])}</summary></entry>\n".encode())
+            f.write(b"</feed>\n")
+        with atomic_open(folder / "rss.xml") as f:
+            f.write(f'{XML_HEADER}<rss version="2.0"><channel>\n<title>{_escape(self.title)}</title>\n'
+                    f"<link>{_escape(self.site_url)}</link>\n<description>{_escape(self.title)}</description>\n"
+                    .encode())
+            for url in newest:
+                page = self.pages[url]
+                published = datetime.strptime(page["published"], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+                f.write(f"<item><title>{_escape(page['title'])}</title><link>{_escape(self._url(url))}</link>"
+                        f"<guid>{_escape(self._url(url))}</guid><pubDate>{format_datetime(published)}</pubDate>"
+                        f"<description>{_escape(page['description'])}</description></item>\n".encode())
+            f.write(b"</channel></rss>\n")
+        return ["feed.xml", "rss.xml"]
+
+    def _write_index_pages(self, folder: Path, newest: list) -> list:
+        count = max(1, -(-len(newest) // self.per_page))
+        names = ["index.html"] + [f"index-{n}.html" for n in range(2, count + 1)]
+        clashes = [name for name in names if name in self.pages]
+        if clashes:
+            print(f"⚠️  Not writing index pages: {', '.join(clashes)} is a post")
+            return []
+        for number, name in enumerate(names, 1):
+            chunk = newest[(number - 1) * self.per_page:number * self.per_page]
+            items = "\n".join(
+                f'    <article class="card"><h2><a href="{_escape(quote(url))}">{_escape(self.pages[url]["title"] or url)}'
+                f'</a></h2><p class="small">{self.pages[url]["published"][:10]}</p>'
+                f'<p>{_escape(self.pages[url]["description"])}</p></article>' for url in chunk)
+            links = []
+            if number > 1:
+                links.append(f'<a class="secondary" href="{names[number - 2]}">← Newer</a>')
+            if number < count:
+                links.append(f'<a class="secondary" href="{names[number]}">Older →</a>')
+            context = {"title": _escape(self.title), "items": items, "pager": " ".join(links),
+                       "page": f"Page {number} of {count}"}
+            context["include"] = lambda template: render(template, context)
+            with atomic_open(folder / name) as f:
+                f.write(render("index.html", context).encode("utf-8"))
+        return names
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps({"pages": self.pages, "digest": self.digest, "files": self.files}),
+                       encoding="utf-8")
+        os.replace(tmp, self.path)
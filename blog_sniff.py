@@ -0,0 +1,221 @@
+"""
+Image type and size sniffing for the blog generator
+Identifies images by their magic bytes rather than their suffix and reads
+their pixel dimensions from the header, so a misnamed figure still gets
+the right MIME type and pages can reserve space for every image.
+"""
+import re
+import struct
+
+# Enough for any header we parse, including JPEG EXIF blocks before SOF
+HEADER_BYTES = 64 * 1024
+
+# Fallback when the header is not recognised
+SUFFIX_TYPES = {
+    "jpg": "image/jpeg", "jpeg": "image/jpeg", "png": "image/png", "gif": "image/gif",
+    "webp": "image/webp", "avif": "image/avif", "svg": "image/svg+xml", "bmp": "image/bmp",
+    "tif": "image/tiff", "tiff": "image/tiff", "ico": "image/x-icon",
+}
+
+# Canonical suffix per type, for files whose suffix does not match their content
+TYPE_SUFFIXES = {
+    "image/jpeg": ".jpg", "image/png": ".png", "image/gif": ".gif", "image/webp": ".webp",
+    "image/avif": ".avif", "image/svg+xml": ".svg", "image/bmp": ".bmp", "image/tiff": ".tif",
+    "image/x-icon": ".ico", "image/heic": ".heic",
+}
+
+# (offset, magic, MIME type), checked in order
+SIGNATURES = (
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (8, b"WEBP", "image/webp"),
+    (0, b"II*\x00", "image/tiff"),
+    (0, b"MM\x00*", "image/tiff"),
+    (0, b"BM", "image/bmp"),
+    (0, b"\x00\x00\x01\x00", "image/x-icon"),
+)
+
+# ISO-BMFF (ftyp) brands of still images
+FTYP_BRANDS = {b"avif": "image/avif", b"avis": "image/avif", b"heic": "image/heic", b"heix": "image/heic"}
+
+# Formats browsers cannot display; they need converting before use
+UNSUPPORTED = {"image/tiff", "image/heic"}
+
+SVG_TAG = re.compile(rb"<svg\b[^>]*>", re.I)
+SVG_ATTR = re.compile(rb"""\b(width|height|viewBox)\s*=\s*["']([^"']*)["']""", re.I)
+
+# Rotated EXIF orientations, where width and height swap on display
+EXIF_TRANSPOSED = {5, 6, 7, 8}
+
+
+def sniff_mime(head) -> str:
+    """MIME type from the first bytes of a file, or None if unrecognised"""
+    head = bytes(head[:512])
+    for offset, magic, mime in SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            if mime == "image/webp" and head[:4] != b"RIFF":
+                continue
+            return mime
+    if head[4:8] == b"ftyp":
+        size = struct.unpack(">I", head[:4])[0]
+        brands = [head[8:12]] + [head[i:i + 4] for i in range(16, min(size, len(head)), 4)]
+        for brand in brands:
+            if brand in FTYP_BRANDS:
+                return FTYP_BRANDS[brand]
+    text = head.lstrip(b"\xef\xbb\xbf \t\r\n")
+    if text.startswith(b"<") and SVG_TAG.search(text):
+        return "image/svg+xml"
+    return None
+
+
+def _tiff_tags(data: bytes, wanted: set) -> dict:
+    """Values of the wanted tags in the first IFD of TIFF-structured data"""
+    order = {b"II": "<", b"MM": ">"}.get(bytes(data[:2]))
+    if order is None or len(data) < 8:
+        return {}
+    offset = struct.unpack(order + "I", data[4:8])[0]
+    if offset + 2 > len(data):
+        return {}
+    count = struct.unpack(order + "H", data[offset:offset + 2])[0]
+    tags = {}
+    for i in range(count):
+        entry = offset + 2 + i * 12
+        if entry + 12 > len(data):
+            break
+        tag, kind = struct.unpack(order + "HH", data[entry:entry + 4])
+        if tag in wanted:
+            # SHORT values sit in the first two bytes of the value field
+            fmt = "H" if kind == 3 else "I"
+            tags[tag] = struct.unpack(order + fmt, data[entry + 8:entry + 8 + struct.calcsize(fmt)])[0]
+    return tags
+
+
+def _jpeg_size(head):
+    pos, transposed = 2, False
+    while pos + 4 <= len(head):
+        if head[pos] != 0xFF:
+            return None
+        marker = head[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            pos += 2
+            continue
+        length = struct.unpack(">H", head[pos + 2:pos + 4])[0]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            if pos + 9 > len(head):
+                return None
+            height, width = struct.unpack(">HH", head[pos + 5:pos + 9])
+            return (height, width) if transposed else (width, height)
+        if marker == 0xE1 and head[pos + 4:pos + 10] == b"Exif\x00\x00":
+            orientation = _tiff_tags(bytes(head[pos + 10:pos + 2 + length]), {0x0112}).get(0x0112)
+            transposed = orientation in EXIF_TRANSPOSED
+        pos += 2 + length
+    return None
+
+
+def _png_size(head):
+    return struct.unpack(">II", head[16:24]) if len(head) >= 24 else None
+
+
+def _gif_size(head):
+    return struct.unpack("<HH", head[6:10]) if len(head) >= 10 else None
+
+
+def _bmp_size(head):
+    if len(head) < 26:
+        return None
+    if struct.unpack("<I", head[14:18])[0] == 12:
+        return struct.unpack("<HH", head[18:22])
+    width, height = struct.unpack("<ii", head[18:26])
+    return width, abs(height)
+
+
+def _webp_size(head):
+    chunk = bytes(head[12:16])
+    if chunk == b"VP8 " and len(head) >= 30:
+        width, height = struct.unpack("<HH", head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(head) >= 25:
+        bits = int.from_bytes(head[21:25], "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(head) >= 30:
+        return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+    return None
+
+
+def _ftyp_size(head):
+    head = bytes(head)
+    at = head.find(b"ispe")
+    if at < 0 or at + 16 > len(head):
+        return None
+    width, height = struct.unpack(">II", head[at + 8:at + 16])
+    rotation = head.find(b"irot")
+    if 0 <= rotation < len(head) - 4 and head[rotation + 4] & 1:
+        return height, width
+    return width, height
+
+
+def _tiff_size(head):
+    tags = _tiff_tags(bytes(head), {256, 257})
+    return (tags[256], tags[257]) if 256 in tags and 257 in tags else None
+
+
+def _svg_length(value: bytes):
+    match = re.fullmatch(rb"\s*([\d.]+)\s*(px)?\s*", value)
+    return float(match.group(1)) if match else None
+
+
+def _svg_size(head):
+    tag = SVG_TAG.search(bytes(head))
+    if not tag:
+        return None
+    attrs = {name.lower(): value for name, value in SVG_ATTR.findall(tag.group())}
+    width, height = (_svg_length(attrs.get(k, b"")) for k in (b"width", b"height"))
+    if not (width and height) and b"viewbox" in attrs:
+        box = [float(n) for n in re.split(rb"[\s,]+", attrs[b"viewbox"].strip()) if n]
+        if len(box) == 4:
+            width, height = box[2], box[3]
+    return (round(width), round(height)) if width and height else None
+
+
+SIZE_PARSERS = {
+    "image/jpeg": _jpeg_size,
+    "image/png": _png_size,
+    "image/gif": _gif_size,
+    "image/bmp": _bmp_size,
+    "image/webp": _webp_size,
+    "image/avif": _ftyp_size,
+    "image/heic": _ftyp_size,
+    "image/tiff": _tiff_size,
+    "image/svg+xml": _svg_size,
+}
+
+
+def sniff(head):
+    """(MIME type, (width, height)) from a file's first bytes; either may be None"""
+    head = head[:HEADER_BYTES]
+    mime = sniff_mime(head)
+    parser = SIZE_PARSERS.get(mime)
+    try:
+        size = parser(head) if parser else None
+    except (struct.error, ValueError, IndexError):
+        size = None
+    return mime, size if size and all(size) else None
+
+
+def suffix_for(path, mime) -> str:
+    """path's own suffix if it fits mime, else the canonical one for mime"""
+    suffix = path.suffix.lower()
+    if mime is None or SUFFIX_TYPES.get(suffix.lstrip(".")) == mime:
+        return suffix
+    return TYPE_SUFFIXES.get(mime, suffix)
+
+
+def sniff_file(path):
+    """sniff() on the first HEADER_BYTES of path"""
+    with open(path, "rb") as f:
+        return sniff(f.read(HEADER_BYTES))
@@ -0,0 +1,91 @@
+"""
+Tiny template layer for the blog generator
+Templates are plain HTML/CSS/JS files with {{ name }} or {{ name:arg }}
+placeholders. A template is parsed once into literal chunks and slots,
+so rendering many pages is just a join over precompiled parts.
+"""
+import re
+from functools import lru_cache
+from pathlib import Path
+
+# Partials live next to this script
+template_dir = Path(__file__).resolve().parent / "templates"
+
+# {{ name }} inserts context[name]; {{ name:arg }} inserts context[name](arg)
+PLACEHOLDER = re.compile(r"\{\{\s*(\w+)(?::(.*?))?\s*\}\}")
+
+
+class TemplateError(Exception):
+    """Raised when a template cannot be loaded or rendered"""
+
+
+class Template:
+    """A template compiled into literal strings and (name, arg) slots"""
+
+    def __init__(self, source: str, name: str = "<string>"):
+        self.name = name
+        self.source = source
+        self.parts = []
+        pos = 0
+        for match in PLACEHOLDER.finditer(source):
+            if match.start() > pos:
+                self.parts.append(source[pos:match.start()])
+            arg = match.group(2)
+            self.parts.append((match.group(1), arg.strip() if arg is not None else None))
+            pos = match.end()
+        if pos < len(source):
+            self.parts.append(source[pos:])
+        # Partials without slots (CSS, JS) render to the same string every time
+        self.static = source if not self.placeholders else None
+
+    @property
+    def placeholders(self) -> set:
+        """Names of every context value this template needs"""
+        return {part[0] for part in self.parts if isinstance(part, tuple)}
+
+    def render(self, context: dict) -> str:
+        """Fill the slots from context; values are inserted as-is (no escaping)"""
+        if self.static is not None:
+            return self.static
+        out = []
+        for part in self.parts:
+            if isinstance(part, str):
+                out.append(part)
+                continue
+            name, arg = part
+            try:
+                value = context[name]
+            except KeyError:
+                raise TemplateError(f"{self.name}: no value for {{{{ {name} }}}}") from None
+            out.append(str(value if arg is None else value(arg)))
+        return "".join(out)
+
+
+@lru_cache(maxsize=None)
+def compile_template(source: str, name: str = "<string>") -> Template:
+    """Compile a template string, reusing the result for identical sources"""
+    return Template(source, name)
+
+
+@lru_cache(maxsize=None)
+def load_template(name: str) -> Template:
+    """Load and compile templates/<name>, dropping one trailing newline
+
+    Names must stay inside template_dir: absolute paths, ".." and
+    symlinks out of it are refused.
+    """
+    path = (template_dir / name).resolve()
+    if Path(name).is_absolute() or ".." in Path(name).parts or not path.is_relative_to(template_dir):
+        raise TemplateError(f"Cannot load template {name}: outside {template_dir}")
+    try:
+        source = path.read_text(encoding="utf-8")
+    except OSError as e:
+        raise TemplateError(f"Cannot load template {name}: {e}") from None
+    if source.endswith("\n"):
+        source = source[:-1]
+    return compile_template(source, name)
+
+
+def render(name: str, context: dict = None) -> str:
+    """Render templates/<name> with context"""
+    return load_template(name).render(context or {})
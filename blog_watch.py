@@ -0,0 +1,159 @@
+"""
+File watching for the blog generator's --watch mode
+Uses Linux inotify through ctypes when available and falls back to
+polling file stats everywhere else.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM
+              | IN_MOVED_TO | IN_CREATE | IN_DELETE)
+
+# struct inotify_event header: wd, mask, cookie, len
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def _walk_dirs(folders, ignore):
+    """Yield every directory under folders that is not ignored"""
+    for folder in folders:
+        for root, dirs, _ in os.walk(folder):
+            dirs[:] = [d for d in dirs if not ignore(Path(root) / d)]
+            yield Path(root)
+
+
+class PollingWatcher:
+    """Detects changes by comparing (size, mtime) snapshots of every file"""
+
+    def __init__(self, folders, ignore=lambda path: False, interval: float = 0.25):
+        self.folders = [Path(f) for f in folders]
+        self.ignore = ignore
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self) -> dict:
+        files = {}
+        for folder in _walk_dirs(self.folders, self.ignore):
+            for entry in os.scandir(folder):
+                path = Path(entry.path)
+                if entry.is_file() and not self.ignore(path):
+                    st = entry.stat()
+                    files[path] = (st.st_size, st.st_mtime_ns)
+        return files
+
+    def wait(self, timeout=None) -> set:
+        """Block until files change or timeout seconds pass; return changed paths"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            current = self._scan()
+            changed = {path for path in current.keys() | self.snapshot.keys()
+                       if current.get(path) != self.snapshot.get(path)}
+            self.snapshot = current
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            delay = self.interval if deadline is None else min(self.interval, max(0, deadline - time.monotonic()))
+            time.sleep(delay)
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Linux inotify watcher over every directory under folders"""
+
+    def __init__(self, folders, ignore=lambda path: False):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.ignore = ignore
+        self.dirs = {}
+        for folder in _walk_dirs(folders, ignore):
+            self._watch(folder)
+
+    def _watch(self, folder: Path) -> None:
+        wd = self._add_watch(self.fd, os.fsencode(folder), WATCH_MASK)
+        if wd >= 0:
+            self.dirs[wd] = folder
+
+    def wait(self, timeout=None) -> set:
+        """Block until files change or timeout seconds pass; return changed paths"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            folder = self.dirs.get(wd)
+            if mask & IN_Q_OVERFLOW:
+                changed.update(self.dirs.values())
+            if folder is None or not name:
+                continue
+            path = folder / os.fsdecode(name)
+            if self.ignore(path):
+                continue
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    for sub in _walk_dirs([path], self.ignore):
+                        self._watch(sub)
+                continue
+            changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def open_watcher(folders, ignore=lambda path: False, poll: bool = False):
+    """Return an inotify watcher where supported, else a polling one"""
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(folders, ignore)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(folders, ignore)
+
+
+def watch(watcher, on_change, debounce: float = 0.2) -> None:
+    """Call on_change(paths, first_event_time) once per burst of changes
+
+    A burst ends when no new change arrives for debounce seconds, so an
+    editor's save-rename-chmod sequence triggers a single rebuild.
+    """
+    while True:
+        changed = watcher.wait()
+        if not changed:
+            continue
+        first = time.perf_counter()
+        while True:
+            more = watcher.wait(debounce)
+            if not more:
+                break
+            changed |= more
+        on_change(changed, first)
@@ -0,0 +1,25 @@
+        // Swap the build-time image placeholders for the real images
+        function hydrateImage(img) {
+            if (!img.dataset.src && !img.dataset.sameAs) return;
+            const original = img.dataset.sameAs ? document.getElementById(img.dataset.sameAs) : img;
+            const src = original.dataset.src || original.src;
+            img.removeAttribute('data-src');
+            img.removeAttribute('data-same-as');
+            img.src = src;
+        }
+
+        function hydrateImages(root) {
+            root.querySelectorAll('img[data-src], img[data-same-as]').forEach(hydrateImage);
+        }
+
+        // Load images shortly before they scroll into view
+        const imageObserver = new IntersectionObserver((entries) => {
+            entries.forEach(entry => {
+                if (entry.isIntersecting) {
+                    imageObserver.unobserve(entry.target);
+                    hydrateImage(entry.target);
+                }
+            });
+        }, { rootMargin: '200px 0px' });
+
+        document.querySelectorAll('img[data-src], img[data-same-as]').forEach(img => imageObserver.observe(img));
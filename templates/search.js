@@ -0,0 +1,65 @@
+// Client-side search over the index written by blog_search.py
+// Load with <script src="search/search.js"></script>, then:
+//   blogSearch('flood maps').then(results => ...)  // [{url, title, score}], best first
+// Only index.json and the shards holding the query's terms are fetched.
+(function () {
+    const base = new URL('.', document.currentScript.src);
+    const cache = {};
+    const fetchJSON = name => cache[name] || (cache[name] = fetch(new URL(name, base)).then(r => {
+        if (!r.ok) throw new Error(`search: ${name}: ${r.status}`);
+        return r.json();
+    }));
+
+    // Shards that may hold term or, for the last word being typed, terms starting with it
+    function shardsFor(index, term, prefix) {
+        let longest = '';
+        const names = [];
+        for (const key of Object.keys(index.shards)) {
+            if (term.startsWith(key) && key.length > longest.length) longest = key;
+            else if (prefix && key.startsWith(term)) names.push(index.shards[key]);
+        }
+        if (longest) names.push(index.shards[longest]);
+        return names;
+    }
+
+    async function blogSearch(query) {
+        const index = await fetchJSON('index.json');
+        const stopwords = new Set(index.stopwords);
+        const terms = (query.toLowerCase().match(/[\p{L}\p{N}]+/gu) || [])
+            .filter(t => t.length >= 2 && !stopwords.has(t));
+        if (!terms.length) return [];
+        let scores = null;
+        for (const [i, term] of terms.entries()) {
+            const prefix = i === terms.length - 1;
+            const shards = await Promise.all(shardsFor(index, term, prefix).map(fetchJSON));
+            const found = new Map();
+            for (const shard of shards) {
+                for (const [word, postings] of Object.entries(shard)) {
+                    if (word !== term && !(prefix && word.startsWith(term))) continue;
+                    // Rarer words count for more; completions count half
+                    const idf = Math.log(1 + index.pages.length / (postings.length / 2));
+                    const boost = word === term ? 1 : 0.5;
+                    for (let j = 0; j < postings.length; j += 2) {
+                        found.set(postings[j], (found.get(postings[j]) || 0) + postings[j + 1] * idf * boost);
+                    }
+                }
+            }
+            // Every term must match
+            if (scores) {
+                for (const page of scores.keys()) {
+                    if (found.has(page)) scores.set(page, scores.get(page) + found.get(page));
+                    else scores.delete(page);
+                }
+            } else {
+                scores = found;
+            }
+            if (!scores.size) return [];
+        }
+        return [...scores]
+            .sort((a, b) => b[1] - a[1])
+            .map(([page, score]) => ({url: new URL(index.pages[page][0], new URL('..', base)).href,
+                                      title: index.pages[page][1], score}));
+    }
+
+    window.blogSearch = blogSearch;
+})();
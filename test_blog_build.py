@@ -0,0 +1,55 @@
+"""
+Regression tests for post parsing in blog_build
+Run: python -m pytest test_blog_build.py
+"""
+from pathlib import Path
+
+import pytest
+
+from blog_build import parse_front_matter, post_from_record
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("---\ntitle: Floods: 2018\nimages: a.jpeg, b.png\n---\n<p>x</p>\n",
+     ({"title": "Floods: 2018", "images": "a.jpeg, b.png"}, "<p>x</p>\n")),
+    # Blank lines and comments in the block are skipped
+    ("---\n\n# draft\n  layout : wide.html \n---\nbody", ({"layout": "wide.html"}, "body")),
+    # No front-matter at all
+    ("<p>---\ntitle: x\n---</p>", ({}, "<p>---\ntitle: x\n---</p>")),
+])
+def test_parse_front_matter(text, expected):
+    assert parse_front_matter(text) == expected
+
+
+@pytest.mark.parametrize("text, message", [
+    ("---\ntitle: x\n<p>x</p>", "closing ---"),
+    ("---\njust text\n---\nbody", "not 'key: value'"),
+])
+def test_parse_front_matter_errors(text, message):
+    with pytest.raises(ValueError, match=message):
+        parse_front_matter(text)
+
+
+def test_post_from_record():
+    post = post_from_record({"title": "Hi There!", "images": ["a.jpeg", "b.png"], "body": "x"}, Path("feed.jsonl"))
+    assert post.output == "hi-there.html"
+    assert post.images == ["a.jpeg", "b.png"]
+    assert post.layout == "page.html"
+    assert post_from_record({"id": 7, "output": "sub/page.html", "body": "x"}, Path("f")).output == "sub/page.html"
+
+
+@pytest.mark.parametrize("record, message", [
+    ({"body": "x", "output": "../x.html"}, "outside the output folder"),
+    ({"body": "x", "output": "/tmp/x.html"}, "outside the output folder"),
+    ({"body": "x", "layout": "../../etc/passwd"}, "outside the templates folder"),
+    ({"body": "x", "layout": "/etc/passwd"}, "outside the templates folder"),
+    ({"body": "{{ include:../secret.html }}"}, "include '../secret.html' is outside"),
+    ({"body": "{{ include:/etc/passwd }}"}, "include '/etc/passwd' is outside"),
+    ({"title": "x"}, "neither 'sections' nor 'body'"),
+    ({"body": "x", "tags": ["a"]}, "'tags' must be a string"),
+    ({"sections": "x"}, "'sections' must be a list"),
+    ([1], "not a JSON object"),
+])
+def test_post_from_record_rejects(record, message):
+    with pytest.raises(ValueError, match=message):
+        post_from_record(record, Path("feed.jsonl"))
@@ -0,0 +1,69 @@
+"""
+Regression tests for blog_css purging and the critical/deferred split
+Run: python -m pytest test_blog_css.py
+"""
+from blog_css import DomIndex, minify, optimize_page_css, parse, purge, split_critical
+
+CSS = """
+/* base */
+.hero { color: red; animation: fade 1s; }
+.hero h1 , .unused h1 { font-size: 2em; }
+.unused { color: blue }
+p > a { content: "a  ,  b" ; }
+.js-open { display: block }
+@keyframes fade { from { opacity: 0 } to { opacity: 1 } }
+@keyframes spin { to { transform: rotate(1turn) } }
+@media (max-width: 600px) { .unused { x: y } .card { padding: 0 } }
+"""
+
+PAGE = (f"<html><head><style>{CSS}</style></head><body><section class=\"hero\"><h1>T</h1></section>"
+        "<div class=\"card\"><p><a>x</a></p></div></body></html>")
+
+CRITICAL = ".hero{color:red;animation:fade 1s}.hero h1{font-size:2em}@keyframes fade{from{opacity:0}to{opacity:1}}"
+DEFERRED = 'p>a{content:"a  ,  b"}@media (max-width:600px){.card{padding:0}}'
+
+
+def test_purge():
+    # Unmatched selectors, emptied @media children and unused @keyframes go; strings stay as written
+    index = DomIndex(PAGE)
+    assert minify(purge(parse(CSS), index.all)) == (
+        '.hero{color:red;animation:fade 1s}.hero h1{font-size:2em}p>a{content:"a  ,  b"}'
+        "@keyframes fade{from{opacity:0}to{opacity:1}}@media (max-width:600px){.card{padding:0}}")
+
+
+def test_purge_keeps_classes_added_by_scripts():
+    index = DomIndex(PAGE)
+    assert ".js-open{display:block}" in minify(purge(parse(CSS), index.all, keep={"js-open"}))
+
+
+def test_split_critical():
+    # The hero's rules are critical, and so are the keyframes they use
+    index = DomIndex(PAGE)
+    critical, deferred = split_critical(purge(parse(CSS), index.all), index.critical)
+    assert minify(critical) == CRITICAL
+    assert minify(deferred) == DEFERRED
+
+
+def test_optimize_page_css_inline():
+    page, stats = optimize_page_css(PAGE)
+    assert page.startswith(f"<html><head><style>{CRITICAL}</style></head>")
+    assert page.endswith(f"<style>{DEFERRED}</style>\n</body></html>")
+    assert stats == {"original": len(CSS), "critical": len(CRITICAL), "deferred": len(DEFERRED)}
+
+
+def test_optimize_page_css_linked():
+    deferred = []
+
+    def href(css):
+        deferred.append(css)
+        return "assets/site.css"
+
+    page, _ = optimize_page_css(PAGE, href)
+    assert deferred == [DEFERRED]
+    assert '<link rel="preload" href="assets/site.css" as="style"' in page
+    assert '<noscript><link rel="stylesheet" href="assets/site.css"></noscript></head>' in page
+    assert page.count("<style>") == 1
+
+
+def test_optimize_page_css_without_style():
+    assert optimize_page_css("<p>no style</p>") == ("<p>no style</p>", None)
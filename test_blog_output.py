@@ -0,0 +1,31 @@
+"""
+Regression tests for blog_output.minify_html
+Run: python -m pytest test_blog_output.py
+"""
+import pytest
+
+from blog_output import minify_html
+
+
+@pytest.mark.parametrize("page, expected", [
+    # Whitespace next to block tags goes, between inline content it collapses
+    ("<div>\n  <p>  a  b  </p>\n</div>", "<div><p>a b</p></div>"),
+    ("<p><b>a</b>  <i>b</i></p>", "<p><b>a</b> <i>b</i></p>"),
+    # Whitespace inside tags collapses, attribute values are left alone
+    ('<p  class="x"  >y</p>', '<p class="x">y</p>'),
+    ('<p title="a  >  b">x</p>', '<p title="a  >  b">x</p>'),
+    ("<p title='a /> b' >x</p>", "<p title='a /> b'>x</p>"),
+    ("<br  />", "<br/>"),
+    # A dropped comment is no boundary: the text around it keeps one space
+    ("<p>x<!-- c --> y</p>", "<p>x y</p>"),
+    ("<p>x <!-- c -->y</p>", "<p>x y</p>"),
+    ("<p>x <!-- c --> y</p>", "<p>x y</p>"),
+    ("<p>x<!-- c -->y</p>", "<p>xy</p>"),
+    ("<div><!-- c -->\n  text</div>", "<div>text</div>"),
+    # Conditional comments and raw-text elements are kept byte for byte
+    ("<p>a</p>\n<!--[if IE]><p>ie</p><![endif]-->", "<p>a</p><!--[if IE]><p>ie</p><![endif]-->"),
+    ("<pre>  a\n   b </pre>", "<pre>  a\n   b </pre>"),
+    ("<script>if (a  >  b) {}</script>", "<script>if (a  >  b) {}</script>"),
+])
+def test_minify_html(page, expected):
+    assert minify_html(page) == expected
@@ -0,0 +1,51 @@
+"""
+Regression tests for the request header parsing in blog_serve
+Run: python -m pytest test_blog_serve.py
+"""
+import pytest
+
+from blog_serve import accepted_encodings, etag_matches, parse_range
+
+
+@pytest.mark.parametrize("header, size, expected", [
+    ("bytes=0-99", 1000, (0, 99)),
+    ("bytes=500-", 1000, (500, 999)),
+    ("bytes=900-5000", 1000, (900, 999)),
+    ("bytes=-100", 1000, (900, 999)),
+    ("bytes=-5000", 1000, (0, 999)),
+    # Unsatisfiable
+    ("bytes=1000-", 1000, False),
+    ("bytes=5-4", 1000, False),
+    ("bytes=-0", 1000, False),
+    ("bytes=-10", 0, False),
+    # Ignored: the whole file is sent
+    ("bytes=0-1,5-6", 1000, None),
+    ("items=0-1", 1000, None),
+    ("bytes=abc-", 1000, None),
+    ("bytes=5", 1000, None),
+])
+def test_parse_range(header, size, expected):
+    assert parse_range(header, size) == expected
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br", {"gzip", "deflate", "br"}),
+    ("GZIP;q=0.5, br;q=0", {"gzip"}),
+    ("br; q=1.0, gzip;q=bogus", {"br"}),
+    ("*", {"*"}),
+    ("", set()),
+])
+def test_accepted_encodings(header, expected):
+    assert accepted_encodings(header) == expected
+
+
+@pytest.mark.parametrize("header, expected", [
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", "abc"', True),
+    ("*", True),
+    ('"abcd"', False),
+    ("abc", False),
+])
+def test_etag_matches(header, expected):
+    assert etag_matches(header, '"abc"') is expected
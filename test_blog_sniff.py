@@ -0,0 +1,62 @@
+"""
+Regression tests for blog_sniff.sniff and its JPEG/EXIF header parsing
+Run: python -m pytest test_blog_sniff.py
+"""
+import struct
+from pathlib import Path
+
+import pytest
+
+from blog_sniff import _jpeg_size, sniff, suffix_for
+
+
+def jpeg(width, height, orientation=None, order=">"):
+    """A JPEG header: SOI, an optional EXIF APP1 with an orientation, then SOF0"""
+    head = b"\xff\xd8"
+    if orientation is not None:
+        tiff = (b"MM\x00*" if order == ">" else b"II*\x00") + struct.pack(order + "IH", 8, 1)
+        tiff += struct.pack(order + "HHIHH", 0x0112, 3, 1, orientation, 0) + b"\x00" * 4
+        app1 = b"Exif\x00\x00" + tiff
+        head += b"\xff\xe1" + struct.pack(">H", len(app1) + 2) + app1
+    sof = b"\x08" + struct.pack(">HH", height, width) + b"\x03" + b"\x01\x22\x00" * 3
+    return head + b"\xff\xc0" + struct.pack(">H", len(sof) + 2) + sof
+
+
+@pytest.mark.parametrize("head, expected", [
+    (jpeg(640, 480), ("image/jpeg", (640, 480))),
+    # Rotated orientations swap width and height, the others do not
+    (jpeg(640, 480, orientation=1), ("image/jpeg", (640, 480))),
+    (jpeg(640, 480, orientation=3), ("image/jpeg", (640, 480))),
+    (jpeg(640, 480, orientation=6), ("image/jpeg", (480, 640))),
+    (jpeg(640, 480, orientation=8, order="<"), ("image/jpeg", (480, 640))),
+    # A header cut short still names the type
+    (jpeg(640, 480)[:8], ("image/jpeg", None)),
+    (b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR" + struct.pack(">II", 3, 2), ("image/png", (3, 2))),
+    (b"GIF89a" + struct.pack("<HH", 5, 7), ("image/gif", (5, 7))),
+    (b"RIFF\x00\x00\x00\x00WEBPVP8X\x0a\x00\x00\x00\x00\x00\x00\x00"
+     + (99).to_bytes(3, "little") + (49).to_bytes(3, "little"), ("image/webp", (100, 50))),
+    (b"RIFF\x00\x00\x00\x00WAVEfmt ", (None, None)),
+    (b"\x00\x00\x00\x1cftypavif\x00\x00\x00\x00mif1avif" + b"ispe\x00\x00\x00\x00" + struct.pack(">II", 8, 4),
+     ("image/avif", (8, 4))),
+    (b'<?xml version="1.0"?>\n<svg width="120px" height="80">', ("image/svg+xml", (120, 80))),
+    (b'<svg viewBox="0 0 24 12"></svg>', ("image/svg+xml", (24, 12))),
+    (b"not an image", (None, None)),
+])
+def test_sniff(head, expected):
+    assert sniff(head) == expected
+
+
+def test_jpeg_size_skips_markers_before_sof():
+    padded = jpeg(10, 20)[:2] + b"\xff\xff" + b"\xff\xfe\x00\x04hi" + jpeg(10, 20)[2:]
+    assert _jpeg_size(padded) == (10, 20)
+    assert _jpeg_size(b"\xff\xd8\x00\x00\x00\x00") is None
+
+
+@pytest.mark.parametrize("name, mime, expected", [
+    ("a.jpeg", "image/jpeg", ".jpeg"),
+    ("a.JPG", "image/jpeg", ".jpg"),
+    ("a.jpeg", "image/png", ".png"),
+    ("a.jpeg", None, ".jpeg"),
+])
+def test_suffix_for(name, mime, expected):
+    assert suffix_for(Path(name), mime) == expected